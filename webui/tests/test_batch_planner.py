@@ -0,0 +1,61 @@
+from webui.batch_planner import BARRIER_SLOTS, is_batch, parse_orders, plan_orders
+from webui.layout import BARRIER_X
+from webui.plan import Plan
+from webui.simulator import simulate
+
+
+def plays(plan):
+    return sum(1 for step in plan.steps if step[0].op not in ("create_item", "wait"))
+
+
+def barrier_drops(plan):
+    return [
+        action.point
+        for step in plan.steps
+        for action in step
+        if action.op == "place_item" and action.point[0] == BARRIER_X
+    ]
+
+
+def test_parses_orders():
+    assert parse_orders("Move A to D, zone c to zone F and B -> E") == [("A", "D"), ("C", "F"), ("B", "E")]
+
+
+def test_does_not_read_words_as_zones():
+    assert parse_orders("Move a box to the barrier") == []
+
+
+def test_separate_orders_are_a_batch():
+    assert is_batch(parse_orders("Move A to D and B to E"))
+    assert is_batch([("D", "A")] * 6)
+
+
+def test_chained_orders_are_not_a_batch():
+    orders = parse_orders("Move it from D to A, then from A to C")
+    assert orders == [("D", "A"), ("A", "C")]
+    assert not is_batch(orders)
+
+
+def test_one_order_is_not_a_batch():
+    assert not is_batch([("A", "D")])
+
+
+def test_batch_uses_both_bots_at_once():
+    plan = plan_orders([("D", "A")] * 6)
+    assert simulate(plan).ok
+    assert plays(plan) == 27
+
+
+def test_reuses_barrier_slots_once_collected():
+    orders = [("A", "D")] * (len(BARRIER_SLOTS) + 2)
+    plan = plan_orders(orders)
+    drops = barrier_drops(plan)
+    assert len(drops) == len(orders)
+    assert len(set(drops)) == len(BARRIER_SLOTS)
+    assert simulate(plan).ok
+
+
+def test_mixed_batch_simulates_and_round_trips():
+    plan = plan_orders([("A", "B"), ("F", "E"), ("C", "D"), ("E", "A")])
+    assert simulate(plan).ok
+    assert Plan.from_code(plan.to_code()) == plan
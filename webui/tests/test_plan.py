@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from webui.examples import builtin_examples
+from webui.plan import Action, Plan, PlanError
+
+SCENE = """class AIScene(RobotScene):
+    def construct(self):
+        super().construct()
+{body}"""
+
+
+def example_plan(example):
+    return Plan.from_code(re.search(r"```\n(.*?)```", example.answer, re.S).group(1))
+
+
+def parse(*lines):
+    return Plan.from_code(SCENE.format(body="".join(f"        {line}\n" for line in lines)))
+
+
+@pytest.mark.parametrize("example", builtin_examples(), ids=lambda example: example.prompt)
+def test_examples_round_trip_through_code(example):
+    plan = example_plan(example)
+    assert Plan.from_code(plan.to_code()) == plan
+    assert Plan.from_dict(plan.to_dict()) == plan
+
+
+def test_parses_steps():
+    plan = parse(
+        "item = Item(self, color=GREEN, position=(5, 40))",
+        "self.add(item.item)",
+        "self.play(self.blue_bot.move_to_point((5, 40)), self.red_bot.move_to_point((30, 25)))",
+        "self.wait(0.5)",
+    )
+    assert plan.steps == (
+        (Action("create_item", item="item", color="GREEN", point=(5, 40)),),
+        (
+            Action("move_to_point", bot="blue_bot", point=(5, 40)),
+            Action("move_to_point", bot="red_bot", point=(30, 25)),
+        ),
+        (Action("wait", duration=0.5),),
+    )
+
+
+@pytest.mark.parametrize("line", [
+    "item = Item(self, color=UP, position=(5, 40))",
+    "self.wait(-5)",
+    "self.wait(0)",
+    "self.wait(100000)",
+    "import os",
+    "self.play(self.blue_bot.teleport((5, 40)))",
+])
+def test_rejects_what_a_plan_cannot_do(line):
+    with pytest.raises(PlanError):
+        parse(line)
+
+
+def test_rejects_invalid_python():
+    with pytest.raises(PlanError):
+        Plan.from_code("class AIScene(:")
@@ -0,0 +1,69 @@
+import re
+
+from webui.examples import transfer_example
+from webui.plan import Action, Plan
+from webui.scheduler import dependencies, schedule
+from webui.simulator import simulate
+
+
+def example_plan(source, destination):
+    answer = transfer_example(source, destination).answer
+    return Plan.from_code(re.search(r"```\n(.*?)```", answer, re.S).group(1))
+
+
+def steps(*actions):
+    return Plan(tuple((action,) for action in actions))
+
+
+def move(bot, point):
+    return Action("move_to_point", bot=bot, point=point)
+
+
+def pick_up(bot, item):
+    return Action("pick_up_item", bot=bot, item=item)
+
+
+def place(bot, point):
+    return Action("place_item", bot=bot, point=point)
+
+
+def test_keeps_each_bots_order():
+    _, depends = dependencies(steps(move("blue_bot", (5, 40)), move("red_bot", (45, 40)), move("blue_bot", (5, 25))))
+    assert depends == [set(), set(), {0}]
+
+
+def test_pickup_waits_for_the_place_before_it():
+    # The red robot takes over an item the blue robot left at the barrier.
+    _, depends = dependencies(steps(
+        pick_up("blue_bot", "item"),
+        place("blue_bot", (25, 25)),
+        pick_up("red_bot", "item"),
+    ))
+    assert 1 in depends[2]
+
+
+def test_place_waits_for_the_pickup_that_cleared_its_spot():
+    _, depends = dependencies(steps(
+        pick_up("blue_bot", "first"),
+        place("blue_bot", (25, 25)),
+        pick_up("red_bot", "first"),
+        pick_up("blue_bot", "second"),
+        place("blue_bot", (25, 25)),
+    ))
+    assert 2 in depends[4]
+
+
+def test_independent_actions_share_a_step():
+    plan = schedule(steps(move("blue_bot", (5, 40)), move("red_bot", (45, 40))))
+    assert plan.steps == ((move("blue_bot", (5, 40)), move("red_bot", (45, 40))),)
+
+
+def test_cross_barrier_transfer_is_shortened():
+    plan = example_plan("A", "D")
+    scheduled = schedule(plan)
+    assert len(plan.steps) == 17
+    assert len(scheduled.steps) == 9
+    assert simulate(scheduled).ok
+    # Items are created first, and the closing wait is kept.
+    assert scheduled.steps[0][0].op == "create_item"
+    assert scheduled.steps[-1][0].op == "wait"
@@ -0,0 +1,71 @@
+import pytest
+
+from webui.layout import LOAD_ZONES
+from webui.plan import Action, Plan
+from webui.simulator import simulate
+
+
+def run(*steps):
+    return simulate(Plan(tuple(step if isinstance(step, tuple) else (step,) for step in steps)))
+
+
+def create(item, point):
+    return Action("create_item", item=item, color="GREEN", point=point)
+
+
+def kinds(simulation):
+    return [violation.kind for violation in simulation.violations]
+
+
+def test_accepts_a_carry_within_one_side():
+    simulation = run(
+        create("item", LOAD_ZONES["A"]),
+        Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["A"]),
+        Action("pick_up_item", bot="blue_bot", item="item"),
+        Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["B"]),
+        Action("place_item", bot="blue_bot", point=LOAD_ZONES["B"]),
+    )
+    assert simulation.ok
+    assert tuple(simulation.states[-1].item_position("item")) == LOAD_ZONES["B"]
+
+
+@pytest.mark.parametrize("bot, point", [("blue_bot", (40, 25)), ("red_bot", (10, 25))])
+def test_reports_crossing_the_barrier(bot, point):
+    assert kinds(run(Action("move_to_point", bot=bot, point=point))) == ["barrier"]
+
+
+@pytest.mark.parametrize("bot, point", [("blue_bot", (1, 25)), ("red_bot", (49, 49))])
+def test_reports_moves_off_the_floor(bot, point):
+    assert kinds(run(Action("move_to_point", bot=bot, point=point))) == ["edge"]
+
+
+def test_reports_picking_up_out_of_reach():
+    simulation = run(create("item", LOAD_ZONES["B"]), Action("pick_up_item", bot="blue_bot", item="item"))
+    assert kinds(simulation) == ["pickup"]
+
+
+def test_reports_picking_up_while_holding():
+    simulation = run(
+        create("first", LOAD_ZONES["A"]),
+        create("second", LOAD_ZONES["A"]),
+        Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["A"]),
+        Action("pick_up_item", bot="blue_bot", item="first"),
+        Action("pick_up_item", bot="blue_bot", item="second"),
+    )
+    assert kinds(simulation) == ["pickup"]
+    assert simulation.violations[0].step == 4
+
+
+def test_reports_placing_empty_handed():
+    assert kinds(run(Action("place_item", bot="blue_bot", point=LOAD_ZONES["A"]))) == ["place"]
+
+
+def test_reports_placing_outside_zones():
+    simulation = run(
+        create("item", LOAD_ZONES["A"]),
+        Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["A"]),
+        Action("pick_up_item", bot="blue_bot", item="item"),
+        Action("move_to_point", bot="blue_bot", point=(12, 10)),
+        Action("place_item", bot="blue_bot", point=(12, 10)),
+    )
+    assert kinds(simulation) == ["place"]
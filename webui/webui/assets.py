@@ -0,0 +1,234 @@
+"""Publishing rendered videos to the frontend."""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# The app's assets directory, relative to the app root.
+ASSETS_DIR = "assets"
+
+# Where the frontend serves the assets from. In dev mode Reflex mirrors the
+# assets directory into it as files change.
+WEB_ASSETS_DIR = os.path.join(".web", "public")
+
+
+def publish(source_path, filename):
+    """Copy a file into the assets directory.
+
+    The copy is written next to its destination and renamed into place, so
+    the frontend never picks up a partially written video.
+
+    Args:
+        source_path: The file to publish.
+        filename: Its name within the assets directory.
+
+    Returns:
+        The path of the published file.
+    """
+    path = os.path.join(ASSETS_DIR, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+    shutil.copyfile(source_path, partial)
+    os.replace(partial, path)
+    return path
+
+
+def asset_url(path):
+    """Get the URL the frontend serves an asset at."""
+    return "/" + os.path.relpath(path, ASSETS_DIR).replace(os.sep, "/")
+
+
+def asset_path(url):
+    """Get the path of the asset the frontend serves at a URL."""
+    return os.path.join(ASSETS_DIR, *url.lstrip("/").split("/"))
+
+
+def served_path(path):
+    """Get the path the frontend serves an asset from."""
+    if not os.path.isdir(WEB_ASSETS_DIR):
+        return path
+    return os.path.join(WEB_ASSETS_DIR, os.path.relpath(path, ASSETS_DIR))
+
+
+async def wait_until_servable(path, timeout=10, interval=0.05, complete=True):
+    """Wait until the frontend serves the complete file.
+
+    Args:
+        path: The published asset.
+        timeout: How many seconds to wait at most.
+        interval: How many seconds to wait between checks.
+        complete: Whether to wait for the served copy to match the file, or
+            only for it to exist, for files that keep changing like the
+            playlist of a running stream.
+
+    Returns:
+        Whether the file became servable in time.
+    """
+    size = os.path.getsize(path)
+    served = served_path(path)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not (os.path.exists(served) and (not complete or os.path.getsize(served) == size)):
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+class AssetStore:
+    """Published videos and streams, kept apart per session on bounded disk.
+
+    Every session publishes into its own directory under the root, which has
+    to be inside the assets directory to be served. The index maps each
+    asset to its size, last use and how many chat answers show it. Assets
+    no answer shows are deleted once they are older than max_age, and least
+    recently used first while the store is over max_bytes. Shown assets are
+    kept until their session has been idle for session_ttl, because a
+    closed tab never says so.
+    """
+
+    def __init__(self, root, max_bytes, max_age, session_ttl=24 * 3600, interval=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.session_ttl = session_ttl
+        self.interval = interval
+        # When each session last published or used an asset.
+        self.sessions = {}
+        self._task = None
+        # Guards the index and sessions, which eviction reads from a thread
+        # while publishing changes them on the event loop.
+        self._lock = threading.Lock()
+        self.index = self._scan()
+
+    def publish(self, session, source_path, filename):
+        """Copy a video into a session's namespace, shown by one answer.
+
+        Returns:
+            The path of the published file.
+        """
+        with self._lock:
+            path = publish(source_path, os.path.relpath(os.path.join(self.root, session, filename), ASSETS_DIR))
+            self._add(session, path)
+        return path
+
+    def stream_directory(self, session, name):
+        """Make a directory in a session's namespace to stream a render to.
+
+        The stream counts as shown by one answer, like a published video.
+        """
+        path = os.path.join(self.root, session, name)
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            self._add(session, path)
+        return path
+
+    def release(self, url):
+        """Drop an answer's reference to the asset at a URL."""
+        path = asset_path(url)
+        with self._lock:
+            # A stream is shown by the URL of the playlist in its directory.
+            entry = self.index.get(path) or self.index.get(os.path.dirname(path))
+            if entry is not None:
+                entry["refs"] = max(entry["refs"] - 1, 0)
+                entry["used"] = time.time()
+
+    def size(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self.index.values())
+
+    def evict(self):
+        """Delete expired assets, then unshown ones until the store fits."""
+        now = time.time()
+        with self._lock:
+            for session, active in list(self.sessions.items()):
+                if now - active > self.session_ttl:
+                    del self.sessions[session]
+            snapshot = {path: dict(entry) for path, entry in self.index.items()}
+            live = {
+                path for path, entry in snapshot.items()
+                if entry["refs"] > 0 and entry["session"] in self.sessions
+            }
+
+        # Measuring walks the disk, so it happens outside the lock.
+        sizes = {path: _disk_size(path) for path in snapshot}
+        total = sum(sizes.values())
+        for path in sorted(snapshot, key=lambda p: snapshot[p]["used"]):
+            if path in live:
+                continue
+            if total <= self.max_bytes and now - snapshot[path]["used"] <= self.max_age:
+                continue
+            with self._lock:
+                entry = self.index.get(path)
+                # Shown or released again since the snapshot.
+                if entry is None or entry["used"] != snapshot[path]["used"]:
+                    continue
+                del self.index[path]
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+                if not os.listdir(os.path.dirname(path)):
+                    os.rmdir(os.path.dirname(path))
+            total -= sizes.pop(path)
+
+        with self._lock:
+            for path, size in sizes.items():
+                if path in self.index:
+                    self.index[path]["size"] = size
+
+    async def run(self):
+        """Evict in the background every interval seconds."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await loop.run_in_executor(None, self.evict)
+            except Exception:
+                # Keep evicting, or disk use is no longer bounded.
+                logger.exception("Evicting assets failed")
+
+    def _add(self, session, path):
+        """Index a new reference to an asset. Called holding the lock."""
+        now = time.time()
+        self.sessions[session] = now
+        entry = self.index.setdefault(path, {"session": session, "size": 0, "refs": 0})
+        entry["refs"] += 1
+        entry["used"] = now
+        entry["size"] = _disk_size(path)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def _scan(self):
+        """Index what earlier runs left, shown by nobody since they ended."""
+        index = {}
+        if not os.path.isdir(self.root):
+            return index
+        for session in os.listdir(self.root):
+            directory = os.path.join(self.root, session)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                index[path] = {
+                    "session": session,
+                    "size": _disk_size(path),
+                    "refs": 0,
+                    "used": os.path.getmtime(path),
+                }
+        return index
+
+
+def _disk_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
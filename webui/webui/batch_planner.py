@@ -0,0 +1,240 @@
+"""Planning batches of transfer orders without the model.
+
+An order moves an item from one load zone to another. Orders within one
+side of the barrier go to the bot that works there. Orders that cross it
+are split: the source side's bot carries the item to a slot on the
+barrier, and the other bot picks it up there and delivers it.
+
+Each bot carries one item at a time, so a batch is sped up by keeping
+both bots busy instead: the barrier has several slots, and a bot can drop
+off the next item while the previous one still waits to be collected.
+Tasks are ordered by greedy list scheduling, always starting the task
+that can start earliest and, on ties, the one that feeds the other bot.
+The scheduler then merges the actions into the shortest plan their
+dependencies allow.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from webui.examples import zone_bot
+from webui.layout import BARRIER_X, LOAD_ZONES, handoff_point
+from webui.plan import Action, Plan, bot_name
+from webui.scheduler import schedule
+
+# Heights of the places on the barrier where items are handed over, the
+# middle first.
+BARRIER_SLOTS = (25, 30, 20, 35, 15, 40, 10)
+
+# Offsets of the spots within a load zone, so several items can share it.
+ZONE_SPOTS = ((0, 0), (-3, 0), (3, 0), (0, 2), (0, -2), (-3, 2), (3, 2), (-3, -2), (3, -2))
+
+COLORS = ("GREEN", "ORANGE", "PURPLE", "YELLOW", "TEAL", "PINK", "GOLD", "MAROON")
+
+# Every task is four plays: drive there, pick up, drive on, place.
+TASK_PLAYS = 4
+
+# A zone letter, in any case after "zone" but only in capitals on its own,
+# so the word "a" is not read as load zone A.
+_ZONE = r"\b(?:(?i:(?:load\s+)?zones?\s+)([A-Fa-f])|([A-F]))\b"
+ORDER_PATTERN = re.compile(_ZONE + r"\s*(?:->|→|(?i:to)\b)\s*" + _ZONE)
+
+
+@dataclass
+class Task:
+    """One bot's part of an order."""
+
+    order: int
+    bot: str
+    # "carry" within a side, "drop" at the barrier or "deliver" from it.
+    kind: str
+    start: Optional[tuple] = None
+    end: Optional[tuple] = None
+    # The play the task begins at, once scheduled.
+    begins: int = 0
+
+
+def parse_orders(text):
+    """Find the transfer orders in a request, like "A to D, B -> E".
+
+    Returns:
+        A list of (source zone, destination zone) pairs.
+    """
+    orders = []
+    for source, bare_source, destination, bare_destination in ORDER_PATTERN.findall(text):
+        source = (source or bare_source).upper()
+        destination = (destination or bare_destination).upper()
+        if source != destination:
+            orders.append((source, destination))
+    return orders
+
+
+def is_batch(orders):
+    """Tell whether orders are separate transfers to plan as one batch.
+
+    An order that starts where an earlier one ends, like "from D to A, then
+    from A to C", most likely moves the same item again, which a batch
+    would read as a second item. Such requests are left to the model.
+    """
+    destinations = set()
+    for source, destination in orders:
+        if source in destinations:
+            return False
+        destinations.add(destination)
+    return len(orders) > 1
+
+
+def zone_spots(orders):
+    """Give every order its own spot in its source and destination zones.
+
+    Returns:
+        A list of (pickup point, drop point) pairs, one per order.
+    """
+    used = {}
+
+    def spot(zone):
+        dx, dy = ZONE_SPOTS[used.get(zone, 0) % len(ZONE_SPOTS)]
+        used[zone] = used.get(zone, 0) + 1
+        x, y = LOAD_ZONES[zone]
+        return (x + dx, y + dy)
+
+    sources = [spot(source) for source, _ in orders]
+    destinations = [spot(destination) for _, destination in orders]
+    return list(zip(sources, destinations))
+
+
+def assign_tasks(orders):
+    """Split orders into the tasks each bot has to do.
+
+    Returns:
+        A list of Tasks. The barrier ends of drops and deliveries are left
+        to the scheduling, which picks the slots.
+    """
+    tasks = []
+    for i, ((source, destination), (pickup, drop)) in enumerate(zip(orders, zone_spots(orders))):
+        first, second = zone_bot(source), zone_bot(destination)
+        if first == second:
+            tasks.append(Task(i, first, "carry", pickup, drop))
+        else:
+            tasks.append(Task(i, first, "drop", start=pickup))
+            tasks.append(Task(i, second, "deliver", end=drop))
+    return tasks
+
+
+def sequence_tasks(tasks):
+    """Order every bot's tasks and pick the barrier slots, by list scheduling.
+
+    Times are counted in plays. Slots are reused once their item has been
+    collected.
+
+    Returns:
+        The tasks in the order they begin.
+    """
+    free_at = {"blue_bot": 0, "red_bot": 0}
+    # The play each slot's last item is collected at, and the slot and drop
+    # play of every item waiting at the barrier.
+    slot_free = {slot: 0 for slot in BARRIER_SLOTS}
+    slot_busy = set()
+    dropped = {}
+    pending = list(tasks)
+    ordered = []
+    # Feeding the other bot comes first, then emptying slots.
+    priority = {"drop": 0, "deliver": 1, "carry": 2}
+
+    while pending:
+        best = None
+        for task in pending:
+            begins = free_at[task.bot]
+            if task.kind == "drop":
+                slots = [slot for slot in BARRIER_SLOTS if slot not in slot_busy]
+                if not slots:
+                    continue
+                slot = min(slots, key=lambda slot: (slot_free[slot], BARRIER_SLOTS.index(slot)))
+                # The drop is the task's last play and has to follow the pickup
+                # that cleared the slot.
+                begins = max(begins, slot_free[slot] - TASK_PLAYS + 2)
+            elif task.kind == "deliver":
+                if task.order not in dropped:
+                    continue
+                slot, drop_play = dropped[task.order]
+                # The pickup is the task's second play.
+                begins = max(begins, drop_play)
+            key = (begins, priority[task.kind], task.order)
+            if best is None or key < best[0]:
+                best = (key, task, slot if task.kind != "carry" else None)
+
+        (begins, _, _), task, slot = best
+        task.begins = begins
+        if task.kind == "drop":
+            task.end = (BARRIER_X, slot)
+            slot_busy.add(slot)
+            dropped[task.order] = (slot, begins + TASK_PLAYS - 1)
+        elif task.kind == "deliver":
+            task.start = (BARRIER_X, slot)
+            slot_busy.discard(slot)
+            slot_free[slot] = begins + 1
+        free_at[task.bot] = begins + TASK_PLAYS
+        pending.remove(task)
+        ordered.append(task)
+    return ordered
+
+
+def plan_orders(orders):
+    """Plan a batch of orders as one plan.
+
+    Args:
+        orders: A list of (source zone, destination zone) pairs.
+
+    Returns:
+        The scheduled plan.
+    """
+    tasks = assign_tasks(orders)
+    steps = [
+        (Action("create_item", item=f"item_{task.order + 1}", color=COLORS[task.order % len(COLORS)], point=task.start),)
+        for task in tasks
+        if task.kind != "deliver"
+    ]
+
+    # Each action at the play the list scheduling put it at, so pickups at
+    # the barrier follow their drops.
+    timed = []
+    for task in sequence_tasks(tasks):
+        item = f"item_{task.order + 1}"
+        stand = task.start
+        if task.kind == "deliver":
+            stand = handoff_point(task.bot, task.start[1])
+        target = task.end
+        if task.kind == "drop":
+            target = handoff_point(task.bot, task.end[1])
+        actions = [
+            Action("move_to_point", bot=task.bot, point=stand),
+            Action("pick_up_item", bot=task.bot, item=item),
+            Action("move_to_point", bot=task.bot, point=target),
+            Action("place_item", bot=task.bot, point=task.end),
+        ]
+        timed += [(task.begins + offset, task.bot, action) for offset, action in enumerate(actions)]
+    timed.sort(key=lambda entry: (entry[0], entry[1]))
+
+    steps += [(action,) for _, _, action in timed]
+    steps.append((Action("wait", duration=1),))
+    return schedule(Plan(tuple(steps)))
+
+
+def describe_orders(orders, plan):
+    """Explain a batch plan in the style of the model's answers."""
+    lines = []
+    for i, (source, destination) in enumerate(orders, start=1):
+        first, second = zone_bot(source), zone_bot(destination)
+        if first == second:
+            lines.append(f"{i}. Item {i}, {source} to {destination}: the {bot_name(first)} carries it.")
+        else:
+            lines.append(
+                f"{i}. Item {i}, {source} to {destination}: the {bot_name(first)} leaves it at the barrier "
+                f"and the {bot_name(second)} delivers it."
+            )
+    plays = sum(1 for step in plan.steps if step[0].op not in ("create_item", "wait"))
+    return (
+        f"To handle these {len(orders)} orders, the robots share the work:\n\n" + "\n".join(lines)
+        + f"\n\nBoth robots work at the same time, so everything is done in {plays} moves."
+    )
@@ -0,0 +1,365 @@
+"""Benchmark the prompt-to-video pipeline stage by stage.
+
+Runs a corpus of representative plans through the same stages as a chat
+request, answered by the stub chat backend so the numbers do not depend on
+the network:
+
+    prompt     assembling the messages
+    llm        streaming the stub's answer
+    parse      splitting the answer into reasoning and code on every chunk
+    plan       reading the plan out of the code
+    simulate   checking the plan against the floor rules
+    schedule   merging independent actions into shared steps
+    setup      building the scene and its background
+    animate    rendering and encoding the animations and held waits
+    combine    joining the partial movies into one video
+    publish    copying the video into the assets directory
+    servable   waiting for the frontend to serve it
+
+Renders run in this process into a fresh media directory, so neither
+Manim's partial movie cache nor the app's render caches are hit.
+
+Run from the app root, where the assets directory is:
+
+    python -m webui.bench --repeat 5 --quality draft
+    python -m webui.bench --compare bench_results/<commit>_draft.json
+
+Results are saved as JSON named after the current commit and quality.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from manim import config, tempconfig
+
+from webui.assets import publish, wait_until_servable
+from webui.examples import Example, ExampleIndex, default_index, transfer_example
+from webui.grid_scene import QUALITY_TIERS, PlanScene
+from webui.history import HistoryManager
+from webui.layout import LOAD_ZONES
+from webui.llm_backend import StubBackend
+from webui.parsing import StreamingCodeParser
+from webui.plan import Action, Plan
+from webui.prompt import HUMAN_TEMPLATE, PromptBuilder, layout_facts
+from webui.scheduler import schedule
+from webui.simulator import simulate
+from webui.template import Template
+from webui.tracing import Trace
+
+STAGES = (
+    "prompt", "llm", "parse", "plan", "simulate", "schedule",
+    "setup", "animate", "combine", "publish", "servable",
+)
+
+
+def multi_item_example():
+    """Both bots move an item within their own side at the same time."""
+    wait = (Action("wait", duration=1),)
+    steps = (
+        (Action("create_item", item="first", color="GREEN", point=LOAD_ZONES["A"]),),
+        (Action("create_item", item="second", color="ORANGE", point=LOAD_ZONES["F"]),),
+        (
+            Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["A"]),
+            Action("move_to_point", bot="red_bot", point=LOAD_ZONES["F"]),
+        ), wait,
+        (
+            Action("pick_up_item", bot="blue_bot", item="first"),
+            Action("pick_up_item", bot="red_bot", item="second"),
+        ), wait,
+        (
+            Action("move_to_point", bot="blue_bot", point=LOAD_ZONES["C"]),
+            Action("move_to_point", bot="red_bot", point=LOAD_ZONES["D"]),
+        ), wait,
+        (
+            Action("place_item", bot="blue_bot", point=LOAD_ZONES["C"]),
+            Action("place_item", bot="red_bot", point=LOAD_ZONES["D"]),
+        ), wait,
+    )
+    reasoning = (
+        "Both robots can work at once, since each item stays on its robot's side:\n\n"
+        "1. Create one item at load zone A and one at load zone F.\n"
+        "2. The blue robot carries the first item to load zone C.\n"
+        "3. The red robot carries the second item to load zone D."
+    )
+    code = Plan(steps).to_code()
+    return Example(
+        "Two items: move the item at load zone A to load zone C, and the item at load zone F to load zone D.",
+        f"{reasoning}\n\nHere's the code to do this:\n\n```\n{code}```\n",
+    )
+
+
+def corpus():
+    """Get the benchmark cases by name."""
+    return {
+        "single_bot": transfer_example("A", "B"),
+        "single_bot_to_barrier": transfer_example("E"),
+        "cross_barrier": transfer_example("D", "A"),
+        "cross_barrier_reverse": transfer_example("C", "F"),
+        "multi_item": multi_item_example(),
+    }
+
+
+class BenchScene(PlanScene):
+    """A PlanScene that times its stages and counts the frames it renders."""
+
+    def __init__(self, plan, trace, **kwargs):
+        self.trace = trace
+        self.setup_seconds = 0.0
+        super().__init__(plan, **kwargs)
+
+    def setup_scene(self):
+        start = time.perf_counter()
+        super().setup_scene()
+        self.setup_seconds = time.perf_counter() - start
+        self.trace.add("setup", self.setup_seconds)
+
+    def construct(self):
+        start = time.perf_counter()
+        super().construct()
+        self.trace.add("animate", time.perf_counter() - start - self.setup_seconds)
+
+    def play(self, *args, **kwargs):
+        start = self.renderer.time
+        super().play(*args, **kwargs)
+        self.trace.count("frames", round((self.renderer.time - start) * config.frame_rate))
+
+
+def render(plan, quality, trace, media_dir):
+    """Render a plan the way a render worker does, timing its stages.
+
+    Returns:
+        The path of the rendered mp4.
+    """
+    with tempconfig({**quality, "media_dir": media_dir, "output_file": uuid.uuid4().hex}):
+        scene = BenchScene(plan, trace)
+        start = time.perf_counter()
+        scene.render()
+        durations = trace.durations()
+        trace.add("combine", time.perf_counter() - start - durations["setup"] - durations["animate"])
+        return str(scene.renderer.file_writer.movie_file_path)
+
+
+async def run_case(example, backend, prompt, history, index, few_shot, quality, media_dir, scheduled):
+    """Take one case through every stage.
+
+    Returns:
+        The Trace of the run.
+    """
+    trace = Trace()
+    with trace.span("prompt"):
+        history_messages = history.format([])
+        examples = index.search(example.prompt, few_shot)
+        messages = prompt.build(history_messages, example.prompt, examples)
+
+    parser = StreamingCodeParser()
+    parse_seconds = 0.0
+    start = time.perf_counter()
+    async for chunk in backend.astream(messages):
+        chunk_start = time.perf_counter()
+        parser.feed(chunk)
+        # The chat splits the whole answer again on every chunk.
+        parser.reason
+        parser.code
+        parse_seconds += time.perf_counter() - chunk_start
+    trace.add("llm", time.perf_counter() - start - parse_seconds)
+    trace.add("parse", parse_seconds)
+
+    with trace.span("plan"):
+        plan = Plan.from_code(parser.code)
+    with trace.span("simulate"):
+        simulation = simulate(plan)
+    if not simulation.ok:
+        raise ValueError(f"the plan breaks the floor rules:\n{simulation.report()}")
+    if scheduled:
+        with trace.span("schedule"):
+            plan = schedule(plan)
+
+    path = render(plan, quality, trace, media_dir)
+
+    with trace.span("publish"):
+        asset_path = publish(path, os.path.basename(path))
+    with trace.span("servable"):
+        await wait_until_servable(asset_path)
+    os.remove(asset_path)
+    return trace
+
+
+def percentiles(values):
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(np.mean(values)),
+    }
+
+
+def summarize(traces):
+    """Get the timing percentiles and render rate of a list of runs."""
+    durations = [trace.durations() for trace in traces]
+    stages = {
+        stage: percentiles([run.get(stage, 0.0) for run in durations])
+        for stage in STAGES
+    }
+    totals = [sum(run.values()) for run in durations]
+    frames = [trace.counts["frames"] for trace in traces]
+    render_seconds = [run["setup"] + run["animate"] + run["combine"] for run in durations]
+    return {
+        "stages": stages,
+        "total": percentiles(totals),
+        "frames": int(np.median(frames)),
+        "fps": float(np.sum(frames) / np.sum(render_seconds)),
+    }
+
+
+def peak_rss_mb():
+    """Get the peak resident memory of this process and its children, like ffmpeg."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    unit = 2**20 if sys.platform == "darwin" else 2**10
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+async def benchmark(cases, repeat, warmup, quality_name, latency, interval, few_shot, scheduled):
+    """Run every case and summarize the timings.
+
+    Returns:
+        The results, ready to save as JSON.
+    """
+    temp = Template()
+    prompt = PromptBuilder(temp.return_template(), layout_facts(), HUMAN_TEMPLATE)
+    history = HistoryManager(1500)
+    index = default_index()
+    backend = StubBackend(
+        ExampleIndex(cases.values()), temp.return_example_answer(), latency=latency, interval=interval
+    )
+    quality = QUALITY_TIERS[quality_name]
+
+    results = {}
+    media_root = tempfile.mkdtemp(prefix="bench_media_")
+    try:
+        for name, example in cases.items():
+            traces = []
+            for run in range(warmup + repeat):
+                media_dir = os.path.join(media_root, uuid.uuid4().hex)
+                trace = await run_case(
+                    example, backend, prompt, history, index, few_shot, quality, media_dir, scheduled
+                )
+                shutil.rmtree(media_dir, ignore_errors=True)
+                if run >= warmup:
+                    traces.append(trace)
+            results[name] = summarize(traces)
+            print(f"{name}: {results[name]['total']['p50']:.2f}s p50, {results[name]['fps']:.1f} fps", file=sys.stderr)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    commit, dirty = current_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "repeat": repeat,
+            "warmup": warmup,
+            "quality": quality_name,
+            **quality,
+            "stub_latency": latency,
+            "stub_interval": interval,
+            "few_shot": few_shot,
+            "schedule": scheduled,
+        },
+        "cases": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(results, baseline=None):
+    """Print the p50/p95 of every stage, with the change from a baseline run."""
+    header = f"{'case':<24}{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}"
+    if baseline is not None:
+        header += f"{'p50 vs ' + baseline['commit']:>16}"
+    print(header)
+    for name, case in results["cases"].items():
+        rows = list(case["stages"].items()) + [("total", case["total"])]
+        for stage, timing in rows:
+            line = f"{name:<24}{stage:<10}{timing['p50'] * 1000:>10.1f}{timing['p95'] * 1000:>10.1f}"
+            if baseline is not None and name in baseline["cases"]:
+                base = baseline["cases"][name]
+                base_timing = base["total"] if stage == "total" else base["stages"].get(stage)
+                if base_timing and base_timing["p50"] > 0:
+                    change = timing["p50"] / base_timing["p50"] - 1
+                    line += f"{change:>+16.1%}"
+            print(line)
+        print(f"{name:<24}{'frames':<10}{case['frames']:>10}{case['fps']:>10.1f} fps")
+    rss = results["peak_rss_mb"]
+    print(f"peak RSS: {rss['self']:.0f} MB, children {rss['children']:.0f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="measured runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured runs per case first")
+    parser.add_argument("--quality", choices=sorted(QUALITY_TIERS), default="draft")
+    parser.add_argument("--cases", nargs="+", help="the cases to run, all by default")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds before the first chunk")
+    parser.add_argument("--interval", type=float, default=0.0, help="stub seconds between chunks")
+    parser.add_argument("--few-shot", type=int, default=2, help="worked examples in the prompt")
+    parser.add_argument("--no-schedule", action="store_true", help="render plans as the model wrote them")
+    parser.add_argument("--output-dir", default="bench_results")
+    parser.add_argument("--compare", help="a saved results file to compare against")
+    args = parser.parse_args(argv)
+
+    cases = corpus()
+    if args.cases:
+        unknown = set(args.cases) - set(cases)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}; choose from {', '.join(cases)}")
+        cases = {name: cases[name] for name in args.cases}
+
+    results = asyncio.run(benchmark(
+        cases, args.repeat, args.warmup, args.quality, args.latency, args.interval, args.few_shot,
+        not args.no_schedule,
+    ))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    name = results["commit"] + ("-dirty" if results["dirty"] else "")
+    path = os.path.join(args.output_dir, f"{name}_{args.quality}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
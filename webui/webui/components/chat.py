@@ -29,14 +29,57 @@ def message(qa: QA) -> rx.Component:
                 qa.answer,
                 ),
                 rx.cond(
-                    ~State.processing,
-                        rx.video(
-                            url=State.url,
-                            width = "450px",
-                            height = "450px",
-                                
+                    qa.animation != "",
+                    rx.vstack(
+                        rx.html(qa.animation),
+                        rx.cond(
+                            qa.video != "",
+                            rx.video(
+                                url=qa.video,
+                                width="450px",
+                                height="450px",
+                            ),
+                            rx.button(
+                                "Export video",
+                                on_click=State.export_video(qa.plan),
+                                is_disabled=State.processing,
+                                size="sm",
+                            ),
+                        ),
+                        align_items="flex-start",
+                    ),
+                    rx.cond(
+                        qa.rendering,
+                        rx.text(State.render_status, font_size="sm", color=styles.icon_color),
+                        rx.cond(
+                            qa.video != "",
+                            rx.video(
+                                url=qa.video,
+                                width="450px",
+                                height="450px",
+                            ),
+                        ),
+                    ),
+                ),
+                rx.cond(
+                    qa.timings.length() > 0,
+                    rx.accordion(
+                        rx.accordion_item(
+                            rx.accordion_button(
+                                rx.text("Timing", font_size="sm"),
+                                rx.accordion_icon(),
+                            ),
+                            rx.accordion_panel(
+                                rx.foreach(
+                                    qa.timings,
+                                    lambda line: rx.text(line, font_size="sm", color=styles.icon_color),
                                 ),
-
+                            ),
+                            border="none",
+                        ),
+                        allow_toggle=True,
+                        margin_top="0.5em",
+                    ),
                 ),
                 bg=styles.accent_color,
                 shadow=styles.shadow_light,
@@ -0,0 +1,163 @@
+"""A library of worked examples and a lexical index to pick the relevant ones.
+
+The prompt only carries the few examples closest to the request, so the
+library can grow without making prompts longer. The built-in library
+covers moving an item between every pair of load zones and to the barrier.
+More examples can be loaded from a JSON lines file of {"prompt", "answer"}
+objects named by the EXAMPLE_LIBRARY environment variable.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from webui.layout import BARRIER_X, LOAD_ZONES, handoff_point
+from webui.plan import Action, Plan, bot_name
+
+STOPWORDS = {
+    "a", "an", "the", "it", "is", "to", "from", "at", "of", "and", "on", "in",
+    "has", "been", "be", "this", "that", "please", "then", "needs", "can",
+}
+
+
+@dataclass(frozen=True)
+class Example:
+    prompt: str
+    # The reasoning followed by the fenced code, as the model should answer.
+    answer: str
+
+
+def zone_bot(zone):
+    """Get the bot that serves a load zone."""
+    return "blue_bot" if LOAD_ZONES[zone][0] < BARRIER_X else "red_bot"
+
+
+def transfer_example(source, destination=None):
+    """Write the example answer for moving an item between load zones.
+
+    Args:
+        source: The load zone the item starts in.
+        destination: The load zone to move it to, or None for the barrier.
+    """
+    wait = (Action("wait", duration=1),)
+    first = zone_bot(source)
+    reasons = [f"Create the item at load zone {source}."]
+    steps = [(Action("create_item", item="item", color="GREEN", point=LOAD_ZONES[source]),)]
+
+    def carry(bot, start_name, start, end_name, end):
+        reasons.append(f"Move the {bot_name(bot)} to {start_name} and pick up the item.")
+        reasons.append(f"Carry the item to {end_name} and place it.")
+        standing = end if end[0] != BARRIER_X else handoff_point(bot)
+        steps.extend([
+            (Action("move_to_point", bot=bot, point=start),), wait,
+            (Action("pick_up_item", bot=bot, item="item"),), wait,
+            (Action("move_to_point", bot=bot, point=standing),), wait,
+            (Action("place_item", bot=bot, point=end),), wait,
+        ])
+
+    barrier = (BARRIER_X, 25)
+    if destination is None:
+        task = f"move the item at load zone {source} to the barrier"
+        carry(first, f"load zone {source}", LOAD_ZONES[source], "the barrier", barrier)
+    elif zone_bot(destination) == first:
+        task = f"move the item from load zone {source} to load zone {destination}"
+        carry(first, f"load zone {source}", LOAD_ZONES[source], f"load zone {destination}", LOAD_ZONES[destination])
+    else:
+        task = f"move the item from load zone {source} to load zone {destination}"
+        carry(first, f"load zone {source}", LOAD_ZONES[source], "the barrier", barrier)
+        second = zone_bot(destination)
+        reasons.append(f"The {bot_name(second)} cannot cross the barrier either, so it meets the item there.")
+        steps.extend([(Action("move_to_point", bot=second, point=handoff_point(second)),), wait])
+        reasons.append(f"Pick up the item from the barrier, carry it to load zone {destination} and place it.")
+        steps.extend([
+            (Action("pick_up_item", bot=second, item="item"),), wait,
+            (Action("move_to_point", bot=second, point=LOAD_ZONES[destination]),), wait,
+            (Action("place_item", bot=second, point=LOAD_ZONES[destination]),), wait,
+        ])
+
+    if destination is None:
+        prompt = f"Place an item at load zone {source} and move it to the barrier."
+    else:
+        prompt = f"An item has been loaded at load zone {source}. Move it to load zone {destination}."
+    reasoning = f"To {task}, we can do the following:\n\n" + "\n".join(
+        f"{i}. {reason}" for i, reason in enumerate(reasons, start=1)
+    )
+    code = Plan(tuple(steps)).to_code()
+    return Example(prompt, f"{reasoning}\n\nHere's the code to do this:\n\n```\n{code}```\n")
+
+
+def builtin_examples():
+    examples = [transfer_example(source) for source in LOAD_ZONES]
+    for source in LOAD_ZONES:
+        for destination in LOAD_ZONES:
+            if source != destination:
+                examples.append(transfer_example(source, destination))
+    return examples
+
+
+def load_examples(path):
+    with open(path) as f:
+        return [Example(**json.loads(line)) for line in f if line.strip()]
+
+
+def tokenize(text):
+    """Split text into index terms.
+
+    Load zone letters become terms like zone_d, so "from D to A" and
+    "load zone D ... load zone A" match each other and not the word "a".
+    Zones after from or at also give a source term like source_d, and
+    zones after to a destination term, so direction counts.
+    """
+    text = text.lower()
+    text = re.sub(r"\b(?:load\s+)?zones?\s+([a-f])\b", r" zone_\1 ", text)
+    text = re.sub(r"\b(from|to|at|in)\s+([a-f])\b", r"\1 zone_\2 ", text)
+    terms = [word for word in re.findall(r"\w+", text) if word not in STOPWORDS]
+    terms += ["source_" + zone for zone in re.findall(r"\b(?:from|at|in)\s+zone_([a-f])", text)]
+    terms += ["destination_" + zone for zone in re.findall(r"\bto\s+zone_([a-f])", text)]
+    return terms
+
+
+class ExampleIndex:
+    """A BM25 index over the example prompts."""
+
+    def __init__(self, examples, k1=1.5, b=0.75):
+        self.examples = list(examples)
+        self.k1 = k1
+        self.b = b
+        self.documents = [Counter(tokenize(example.prompt)) for example in self.examples]
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        frequencies = Counter(term for document in self.documents for term in document)
+        count = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in frequencies.items()
+        }
+
+    def search(self, query, k):
+        """Get the k examples most relevant to a query, best first."""
+        terms = [term for term in tokenize(query) if term in self.idf]
+        if not terms:
+            return []
+        scores = []
+        for index, document in enumerate(self.documents):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+            score = sum(
+                self.idf[term] * document[term] * (self.k1 + 1) / (document[term] + norm)
+                for term in terms
+                if term in document
+            )
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [self.examples[index] for _, index in scores[:k]]
+
+
+def default_index():
+    examples = builtin_examples()
+    if os.getenv("EXAMPLE_LIBRARY"):
+        examples += load_examples(os.getenv("EXAMPLE_LIBRARY"))
+    return ExampleIndex(examples)
@@ -1,26 +1,78 @@
-from manim import Scene, Square, Circle, BLUE, RED, GREEN, MoveAlongPath, Line, NumberPlane, BLACK, config, WHITE, AnimationGroup, ApplyMethod, UP, DOWN, LEFT, Rectangle, Text
-
-config.pixel_height = 1920
-config.pixel_width = 1920
+import hashlib
+import os
+import shutil
+import subprocess
+
+import manim
+import numpy as np
+from manim import Scene, Square, Circle, BLUE, RED, GREEN, GRAY, MoveAlongPath, VMobject, Line, NumberPlane, BLACK, config, WHITE, AnimationGroup, ApplyMethod, UP, DOWN, LEFT, Rectangle, Text, Camera
+from PIL import Image
+
+from webui.layout import (
+    BLUE_START,
+    RED_START,
+    BARRIER_X,
+    GRID_SIZE,
+    LOAD_ZONES,
+    LOAD_ZONE_SIZE,
+    OBSTACLES,
+    grid_to_scene_coords,
+    layout_key,
+    scene_to_grid_coords,
+)
+from webui.pathing import find_path
+
+# Render quality tiers. A quick draft is shown first and replaced by the
+# final render once it finishes.
+QUALITY_TIERS = {
+    "draft": {
+        "pixel_width": int(os.getenv("DRAFT_PIXELS", "480")),
+        "pixel_height": int(os.getenv("DRAFT_PIXELS", "480")),
+        "frame_rate": int(os.getenv("DRAFT_FPS", "15")),
+    },
+    "final": {
+        "pixel_width": int(os.getenv("FINAL_PIXELS", "1920")),
+        "pixel_height": int(os.getenv("FINAL_PIXELS", "1920")),
+        "frame_rate": int(os.getenv("FINAL_FPS", "60")),
+    },
+}
+
+config.pixel_height = QUALITY_TIERS["final"]["pixel_height"]
+config.pixel_width = QUALITY_TIERS["final"]["pixel_width"]
+config.frame_rate = QUALITY_TIERS["final"]["frame_rate"]
 config.frame_height = 16.0
 config.frame_width = 16.0
 config.background_color = WHITE
 
 class Bot:
-    def __init__(self, scene, color, initial_position):
+    def __init__(self, scene, color, initial_position, name=None):
         self.scene = scene
+        # The bot's name in plans, which routes its moves around obstacles.
+        self.name = name
         grid_space_scale = 0.2
         self.box = Square(color=color).scale(3*grid_space_scale)
-        self.box.move_to(self._grid_to_scene_coords(initial_position))
+        self.box.move_to(grid_to_scene_coords(initial_position))
         self.held_item = None  
 
     def move_to_point(self, point, run_time=2):
-        target_position = self._grid_to_scene_coords(point)
-        bot_move_animation = ApplyMethod(self.box.move_to, target_position)
+        target_position = grid_to_scene_coords(point)
+        waypoints = None
+        if self.name is not None:
+            waypoints = find_path(self.name, scene_to_grid_coords(self.box.get_center()), point)
+
+        if waypoints is not None and len(waypoints) > 2:
+            path = VMobject().set_points_as_corners([grid_to_scene_coords(waypoint) for waypoint in waypoints])
+            bot_move_animation = MoveAlongPath(self.box, path)
+        else:
+            path = None
+            bot_move_animation = ApplyMethod(self.box.move_to, target_position)
 
         if self.held_item is not None:
 
-            item_move_animation = ApplyMethod(self.held_item.item.move_to, target_position)
+            if path is not None:
+                item_move_animation = MoveAlongPath(self.held_item.item, path.copy())
+            else:
+                item_move_animation = ApplyMethod(self.held_item.item.move_to, target_position)
 
             return AnimationGroup(bot_move_animation, item_move_animation, lag_ratio=0)
         else:
@@ -41,7 +93,7 @@ class Bot:
 
     def place_item(self, new_position):
         if self.held_item is not None:
-            animation = ApplyMethod(self.held_item.item.move_to, self._grid_to_scene_coords(new_position))
+            animation = ApplyMethod(self.held_item.item.move_to, grid_to_scene_coords(new_position))
             self.held_item.being_held = False
             self.held_item = None
             return animation
@@ -54,74 +106,270 @@ class Bot:
         item_pos = item.item.get_center()
         return abs(bot_pos[0] - item_pos[0]) <= 1 and abs(bot_pos[1] - item_pos[1]) <= 1
 
-    def _grid_to_scene_coords(self, point):
-        x, y = point
-        scene_x = ((x - 25) * 16 / 50)
-        scene_y = ((y - 25) * 16 / 50)
-        return scene_x, scene_y, 0
 
 class Item:
     def __init__(self, scene, color, position):
         self.scene = scene
         grid_space_scale = 0.1  
         self.item = Circle(color=color).scale(3*grid_space_scale)  
-        self.item.move_to(self._grid_to_scene_coords(position))
+        self.item.move_to(grid_to_scene_coords(position))
         self.being_held = False  
 
     def move_to(self, new_position):
         self.item.move_to(new_position)
 
-    def _grid_to_scene_coords(self, point):
-        x, y = point
-        scene_x = ((x - 25) * 16 / 50)
-        scene_y = ((y - 25) * 16 / 50)
-        return scene_x, scene_y, 0
+
+def static_layer():
+    """Build the mobjects that never move: the grid, the barrier and the load zones."""
+    grid = NumberPlane(
+        x_range=[0, GRID_SIZE, 5],
+        y_range=[0, GRID_SIZE, 5],
+        x_length=16,
+        y_length=16,
+        background_line_style={"stroke_color": BLACK, "stroke_width": 1}
+    )
+    mobjects = [grid]
+
+    line = Line(start=grid.c2p(BARRIER_X, 0), end=grid.c2p(BARRIER_X, GRID_SIZE), color=BLACK, stroke_width=3)
+    mobjects.append(line)
+
+    load_zone_color = BLUE
+    load_zone_fill_opacity = 0.5
+    width, height = LOAD_ZONE_SIZE
+
+    for label_text, pos in LOAD_ZONES.items():
+        zone = Rectangle(width=width, height=height, color=load_zone_color, fill_opacity=load_zone_fill_opacity)
+        zone.move_to(grid.c2p(*pos))
+        mobjects.append(zone)
+
+        label = Text(label_text, font_size=36, color=BLACK).move_to(zone)
+        mobjects.append(label)
+
+    for x0, y0, x1, y1 in OBSTACLES:
+        corner = grid.c2p(x0, y0)
+        size = grid.c2p(x1, y1) - corner
+        obstacle = Rectangle(width=size[0], height=size[1], color=GRAY, fill_opacity=0.8)
+        obstacle.move_to(corner + size / 2)
+        mobjects.append(obstacle)
+
+    return mobjects
+
+
+# Rasterized static layers, keyed by layout and resolution.
+_backgrounds = {}
+
+
+def static_background():
+    """Get the static layer rasterized at the current resolution.
+
+    The image is drawn once per layout and resolution and kept on disk under
+    the media directory, so every scene and every worker process reuses it.
+
+    Returns:
+        The RGBA pixel array to use as the camera background.
+    """
+    key = f"{layout_key()}_{config.pixel_width}x{config.pixel_height}_{config.background_color}"
+    if key not in _backgrounds:
+        name = hashlib.sha256(key.encode()).hexdigest()[:16] + ".png"
+        path = os.path.join(config.media_dir, "backgrounds", name)
+        if not os.path.exists(path):
+            camera = Camera()
+            camera.capture_mobjects(static_layer())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.{os.getpid()}.part"
+            camera.get_image().save(partial, format="PNG")
+            os.replace(partial, path)
+        _backgrounds[key] = np.array(Image.open(path).convert("RGBA"))
+    return _backgrounds[key]
+
+
+def write_held_frame(frame, duration, directory, lookup=None):
+    """Encode a single frame held for a duration as a movie segment.
+
+    ffmpeg clones the frame in the encoder, so it is rendered and piped once
+    however long it is held. Segments are named after their content and
+    reused by later renders.
+
+    Args:
+        frame: The RGBA pixel array to hold.
+        duration: How many seconds to hold it for.
+        directory: Where to write the segment.
+        lookup: Called with the segment's file name before looking for it
+            in the directory.
+
+    Returns:
+        The path of the segment.
+    """
+    height, width = frame.shape[:2]
+    digest = hashlib.sha256(frame.tobytes())
+    digest.update(f"{duration}_{config.frame_rate}".encode())
+    path = os.path.join(directory, f"held_{digest.hexdigest()[:16]}.mp4")
+    if lookup is not None:
+        lookup(os.path.basename(path))
+    if os.path.exists(path):
+        return path
+
+    partial = f"{path}.{os.getpid()}.part.mp4"
+    subprocess.run(
+        [
+            shutil.which("ffmpeg"), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}",
+            "-framerate", str(config.frame_rate), "-i", "-",
+            "-vf", f"tpad=stop_mode=clone:stop_duration={duration - 1 / config.frame_rate}",
+            "-c:v", "libx264", "-tune", "stillimage", "-pix_fmt", "yuv420p",
+            partial,
+        ],
+        input=frame.tobytes(),
+        check=True,
+    )
+    os.replace(partial, path)
+    return path
+
 
 class RobotScene(Scene):
-    def setup_scene(self):
-        grid = NumberPlane(
-            x_range=[0, 50, 5],
-            y_range=[0, 50, 5],
-            x_length=16,
-            y_length=16,
-            background_line_style={"stroke_color": BLACK, "stroke_width": 1}
+    # Draw the static layer from a cached image instead of as mobjects, so
+    # frames only render the bots and items.
+    cached_background = True
+
+    # Encode waits as one held frame instead of rendering every frame.
+    freeze_waits = shutil.which("ffmpeg") is not None
+
+    # The streaming.SegmentWriter to add every animation to as it finishes.
+    stream = None
+
+    # Called with the file name of a partial movie before the scene looks
+    # for it, so a segment store can provide it.
+    segment_lookup = None
+
+    def setup(self):
+        # (index in the partial movie files, segment) for every held wait.
+        self.held_segments = []
+        if self.segment_lookup is not None:
+            file_writer = self.renderer.file_writer
+            is_already_cached = file_writer.is_already_cached
+
+            def lookup(hash_invocation):
+                self.segment_lookup(f"{hash_invocation}{config.movie_file_extension}")
+                return is_already_cached(hash_invocation)
+
+            file_writer.is_already_cached = lookup
+
+    def wait(self, duration=1, stop_condition=None, frozen_frame=None):
+        if (
+            not self.freeze_waits
+            or stop_condition is not None
+            or frozen_frame is False
+            or self.renderer.skip_animations
+            or not config.write_to_movie
+            or self.should_update_mobjects()
+        ):
+            return super().wait(duration, stop_condition, frozen_frame)
+
+        self.renderer.update_frame(self)
+        file_writer = self.renderer.file_writer
+        path = write_held_frame(
+            self.renderer.get_frame(), duration, file_writer.partial_movie_directory, self.segment_lookup
         )
-        self.add(grid)
+        self.held_segments.append((len(file_writer.partial_movie_files), path))
+        self.renderer.time += duration
+        if self.stream is not None:
+            self.stream.add(path, duration)
+
+    def play(self, *args, **kwargs):
+        if self.stream is None:
+            return super().play(*args, **kwargs)
+        files = self.renderer.file_writer.partial_movie_files
+        count, started = len(files), self.renderer.time
+        super().play(*args, **kwargs)
+        # The animation's movie is complete once play returns.
+        if len(files) > count and files[-1]:
+            self.stream.add(files[-1], self.renderer.time - started)
+
+    def tear_down(self):
+        # Splice the held frames in between the animations they follow.
+        for index, path in reversed(self.held_segments):
+            self.renderer.file_writer.partial_movie_files.insert(index, path)
 
-        line = Line(start=grid.c2p(25, 0), end=grid.c2p(25, 50), color=BLACK, stroke_width=3)
-        self.add(line)
+    def setup_scene(self):
+        if self.cached_background:
+            self.camera.background = static_background()
+            self.camera.reset()
+        else:
+            self.add(*static_layer())
 
-        self.blue_bot = Bot(self, BLUE, (12.5, 25))
+        self.blue_bot = Bot(self, BLUE, BLUE_START, name="blue_bot")
         self.add(self.blue_bot.box)
 
-        self.red_bot = Bot(self, RED, (37.5, 25))
+        self.red_bot = Bot(self, RED, RED_START, name="red_bot")
         self.add(self.red_bot.box)
 
-        load_zone_color = BLUE
-        load_zone_fill_opacity = 0.5
-        left_positions = [(5, 40), (5, 25), (5, 10)]
-        right_positions = [(45, 40), (45, 25), (45, 10)]
-        load_zone_labels = ["A", "B", "C", "D", "E", "F"]
+    def construct(self):
+        self.setup_scene()
 
-        for i, pos in enumerate(left_positions):
-            zone = Rectangle(width=3, height=2, color=load_zone_color, fill_opacity=load_zone_fill_opacity)
-            zone.move_to(grid.c2p(*pos))
-            self.add(zone)
 
-            label = Text(load_zone_labels[i], font_size=36, color=BLACK).move_to(zone)
-            self.add(label)
+class PlanScene(RobotScene):
+    """A scene that plays an action plan.
 
-        for i, pos in enumerate(right_positions, start=len(left_positions)):
-            zone = Rectangle(width=3, height=2, color=load_zone_color, fill_opacity=load_zone_fill_opacity)
-            zone.move_to(grid.c2p(*pos))
-            self.add(zone)
+    Args:
+        plan: The plan to play.
+        start: The simulator.FloorState to start from, for rendering a
+            segment of a longer plan.
+    """
 
-            label = Text(load_zone_labels[i], font_size=36, color=BLACK).move_to(zone)
-            self.add(label)
+    def __init__(self, plan, start=None, **kwargs):
+        self.plan = plan
+        self.start = start
+        super().__init__(**kwargs)
 
     def construct(self):
-        self.setup_scene()
-        
+        super().construct()
+
+        items = {}
+        if self.start is not None:
+            items = self.restore(self.start)
+
+        for step in self.plan.steps:
+            animations = []
+            for action in step:
+                if action.op == "create_item":
+                    items[action.item] = Item(self, color=getattr(manim, action.color), position=action.point)
+                    self.add(items[action.item].item)
+                elif action.op == "wait":
+                    self.wait(action.duration)
+                else:
+                    bot = getattr(self, action.bot)
+                    if action.op == "move_to_point":
+                        animations.append(bot.move_to_point(action.point))
+                    elif action.op == "pick_up_item":
+                        animations.append(bot.pick_up_item(items[action.item]))
+                    elif action.op == "place_item":
+                        animations.append(bot.place_item(action.point))
+            if animations:
+                self.play(*animations)
+
+    def restore(self, state):
+        """Put the bots and items where a floor state has them.
+
+        Returns:
+            The items by name.
+        """
+        for bot_name in ("blue_bot", "red_bot"):
+            bot = getattr(self, bot_name)
+            bot.box.move_to(grid_to_scene_coords(state.bot_position(bot_name)))
+
+        items = {}
+        for name, color, position in zip(state.item_names, state.item_colors, state.items):
+            items[name] = Item(self, color=getattr(manim, color), position=tuple(position))
+            self.add(items[name].item)
+
+        for name in state.item_names:
+            bot_name = state.holder(name)
+            if bot_name is not None:
+                getattr(self, bot_name).held_item = items[name]
+                items[name].being_held = True
+        return items
+
+
 class AIScene(RobotScene):
     def construct(self):
         super().construct()
@@ -0,0 +1,86 @@
+"""Conversation history that fits in a token budget."""
+
+from functools import lru_cache
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from webui.plan import Plan, PlanError
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def count_tokens(text):
+    """Count the tokens in text, or estimate them without tiktoken."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=1024)
+def compress_turn(question, answer):
+    """Shorten a question and answer pair for replaying in the prompt.
+
+    The answer's code block is replaced by a summary of its plan, and the
+    <br> tags added for display are dropped. Results are cached, so each
+    turn is compressed once.
+
+    Returns:
+        The user message, the assistant message and their token count.
+    """
+    parts = answer.split("```")
+    reasoning = parts[0].replace("<br>", "").strip()
+    if len(parts) > 1:
+        try:
+            reasoning += "\nPlan: " + Plan.from_code(parts[1]).summary()
+        except PlanError:
+            reasoning += "\n(The code for this answer could not be read.)"
+
+    user = HumanMessage(content=question)
+    assistant = AIMessage(content=reasoning)
+    return user, assistant, count_tokens(question) + count_tokens(reasoning)
+
+
+class HistoryManager:
+    """Turns a chat into prompt messages within a token budget.
+
+    The newest turns are kept. Older turns that do not fit are dropped and
+    their questions listed in a single line, if that still fits.
+    """
+
+    def __init__(self, budget_tokens):
+        self.budget_tokens = budget_tokens
+
+    def format(self, chats):
+        """Get the history messages for a chat.
+
+        Args:
+            chats: The chat's questions and answers, oldest first.
+
+        Returns:
+            The messages, alternating between user and assistant, after an
+            optional summary of the dropped turns.
+        """
+        remaining = self.budget_tokens
+        kept = []
+        for chat in reversed(chats):
+            user, assistant, tokens = compress_turn(str(chat.question), str(chat.answer))
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            kept.append((user, assistant))
+
+        messages = []
+        dropped = chats[:len(chats) - len(kept)]
+        if dropped:
+            summary = "Earlier in this chat the user asked: " + "; ".join(str(chat.question) for chat in dropped)
+            if count_tokens(summary) <= remaining:
+                messages.append(SystemMessage(content=summary))
+
+        for user, assistant in reversed(kept):
+            messages.extend((user, assistant))
+        return messages
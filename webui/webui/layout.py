@@ -0,0 +1,72 @@
+"""The factory floor layout, shared by the renderer and the planners.
+
+Points are in grid coordinates: the floor is a 50 x 50 grid with (0, 0) in
+the bottom left corner.
+"""
+
+import hashlib
+import json
+
+GRID_SIZE = 50
+
+# The rendered floor is a 16 x 16 square of scene units.
+SCENE_SIZE = 16.0
+
+BARRIER_X = 25
+
+BLUE_START = (12.5, 25)
+RED_START = (37.5, 25)
+
+# The blue robot works left of the barrier and the red robot right of it.
+BLUE_MAX_X = 23
+RED_MIN_X = 27
+
+LOAD_ZONES = {
+    "A": (5, 40),
+    "B": (5, 25),
+    "C": (5, 10),
+    "D": (45, 40),
+    "E": (45, 25),
+    "F": (45, 10),
+}
+
+# Width and height of a load zone, in scene units.
+LOAD_ZONE_SIZE = (3, 2)
+
+# Areas no bot can drive through, as (x0, y0, x1, y1) grid rectangles
+# including their edges.
+OBSTACLES = []
+
+
+def handoff_point(bot, y=GRID_SIZE // 2):
+    """Get where a bot stands to reach the barrier at height y."""
+    return (BLUE_MAX_X if bot == "blue_bot" else RED_MIN_X, y)
+
+
+def grid_to_scene_coords(point):
+    x, y = point
+    scene_x = ((x - GRID_SIZE / 2) * SCENE_SIZE / GRID_SIZE)
+    scene_y = ((y - GRID_SIZE / 2) * SCENE_SIZE / GRID_SIZE)
+    return scene_x, scene_y, 0
+
+
+def scene_to_grid_coords(position):
+    x = position[0] * GRID_SIZE / SCENE_SIZE + GRID_SIZE / 2
+    y = position[1] * GRID_SIZE / SCENE_SIZE + GRID_SIZE / 2
+    return x, y
+
+
+def layout_key():
+    """Hash everything that is drawn or planned around, so caches built for
+    one layout are never used with another."""
+    layout = {
+        "grid_size": GRID_SIZE,
+        "scene_size": SCENE_SIZE,
+        "barrier_x": BARRIER_X,
+        "blue_max_x": BLUE_MAX_X,
+        "red_min_x": RED_MIN_X,
+        "load_zones": LOAD_ZONES,
+        "load_zone_size": LOAD_ZONE_SIZE,
+        "obstacles": OBSTACLES,
+    }
+    return hashlib.sha256(json.dumps(layout, sort_keys=True).encode()).hexdigest()[:16]
@@ -0,0 +1,104 @@
+"""Chat model backends.
+
+A backend streams the text of the model's answer to a list of messages.
+CHAT_BACKEND picks the backend: "openai" (the default) or "stub", a
+deterministic local model for working, testing and benchmarking offline.
+"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+
+class ChatBackend(ABC):
+    """The interface every chat backend implements."""
+
+    # The model's name, which the response cache keys on.
+    name = ""
+
+    @abstractmethod
+    def astream(self, messages):
+        """Yield the answer to messages in chunks of text, as an async
+        generator."""
+
+
+class OpenAIBackend(ChatBackend):
+    """An OpenAI chat model, sharing one pooled HTTP client across requests.
+
+    Args:
+        model_name: The OpenAI model.
+        api_key: The OpenAI API key.
+        max_connections: How many connections the pool keeps open at most.
+        timeout: How many seconds to wait for a response.
+    """
+
+    def __init__(self, model_name, api_key, max_connections=20, timeout=60.0):
+        self.name = model_name
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.model = ChatOpenAI(model=model_name, openai_api_key=api_key, http_async_client=self.http_client)
+
+    async def astream(self, messages):
+        async for chunk in self.model.astream(messages):
+            yield chunk.content
+
+
+class StubBackend(ChatBackend):
+    """A deterministic model that answers with the closest worked example.
+
+    Args:
+        index: The ExampleIndex to answer from.
+        fallback: The answer for questions no example matches.
+        latency: How many seconds to wait before the first chunk.
+        interval: How many seconds to wait between chunks.
+        chunk_size: How many characters each chunk holds.
+    """
+
+    name = "stub"
+
+    def __init__(self, index, fallback, latency=0.0, interval=0.0, chunk_size=4):
+        self.index = index
+        self.fallback = fallback
+        self.latency = latency
+        self.interval = interval
+        self.chunk_size = chunk_size
+
+    def answer(self, messages):
+        # The question is the last part of the final human turn.
+        question = messages[-1].content.rsplit("Prompt: ", 1)[-1]
+        examples = self.index.search(question, 1)
+        return examples[0].answer if examples else self.fallback
+
+    async def astream(self, messages):
+        answer = self.answer(messages)
+        await asyncio.sleep(self.latency)
+        for start in range(0, len(answer), self.chunk_size):
+            if start and self.interval:
+                await asyncio.sleep(self.interval)
+            yield answer[start:start + self.chunk_size]
+
+
+def make_backend(index, fallback):
+    """Create the backend the environment asks for.
+
+    Args:
+        index: The ExampleIndex the stub answers from.
+        fallback: The stub's answer when no example matches.
+    """
+    if os.getenv("CHAT_BACKEND", "openai") == "stub":
+        return StubBackend(
+            index,
+            fallback,
+            latency=float(os.getenv("STUB_LATENCY", "0")),
+            interval=float(os.getenv("STUB_TOKEN_INTERVAL", "0")),
+        )
+    return OpenAIBackend(
+        os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+        os.getenv("OPENAI_API_KEY"),
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+    )
@@ -0,0 +1,28 @@
+"""Splitting model answers into their reasoning and code."""
+
+from langchain.schema import BaseOutputParser
+
+
+class CodeParser(BaseOutputParser):
+    def parse(self, text: str):
+        return text.strip().split("```")
+
+
+class StreamingCodeParser:
+    """Split an answer into its reasoning and code while it streams in."""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, chunk: str):
+        self.text += chunk
+
+    @property
+    def reason(self):
+        return CodeParser().parse(self.text)[0]
+
+    @property
+    def code(self):
+        """The fenced code block, as much of it as has arrived."""
+        parsed = CodeParser().parse(self.text)
+        return parsed[1] if len(parsed) > 1 else ""
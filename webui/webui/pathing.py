@@ -0,0 +1,190 @@
+"""Routing bots around obstacles on the floor grid.
+
+Paths run over the integer points of the grid in 8-connected steps and are
+then straightened wherever a direct line costs no more. A bot
+keeps its body on the floor and on its side of the barrier, and out of
+OBSTACLES. Driving over a load zone costs ZONE_COST times as much as open
+floor, so bots go around the zones they are not headed for, but can still
+leave the zone they start in.
+
+A Dijkstra distance field is computed once per bot and goal. Any path to
+that goal is then read off by walking downhill from the start, in time
+proportional to its length, and kept for the next time. Fields and paths
+are cached under the layout key, so they are only recomputed when the
+layout changes.
+"""
+
+import heapq
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from webui.layout import (
+    BLUE_MAX_X,
+    GRID_SIZE,
+    LOAD_ZONE_SIZE,
+    LOAD_ZONES,
+    OBSTACLES,
+    RED_MIN_X,
+    SCENE_SIZE,
+    layout_key,
+)
+from webui.plan import BOTS
+
+ZONE_COST = 10.0
+
+# Half the width of a bot, in grid units, so its body stays clear of edges.
+BOT_RADIUS = 2
+
+# (dx, dy, length) of every step to a neighbouring grid point.
+STEPS = [(dx, dy, math.hypot(dx, dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+def cost_grid(bot):
+    """Get the cost of entering every grid point for a bot.
+
+    Returns:
+        An array indexed [x, y], infinite where the bot cannot go.
+    """
+    return _cost_grid(bot, layout_key())
+
+
+@lru_cache(maxsize=None)
+def _cost_grid(bot, key):
+    coords = np.arange(GRID_SIZE + 1)
+    cost = np.ones((GRID_SIZE + 1, GRID_SIZE + 1))
+    half_width, half_height = np.array(LOAD_ZONE_SIZE) * GRID_SIZE / SCENE_SIZE / 2 + BOT_RADIUS
+    for x, y in LOAD_ZONES.values():
+        inside = (np.abs(coords - x) <= half_width)[:, None] & (np.abs(coords - y) <= half_height)[None, :]
+        cost[inside] = ZONE_COST
+    for x0, y0, x1, y1 in OBSTACLES:
+        cost[max(x0 - BOT_RADIUS, 0):x1 + BOT_RADIUS + 1, max(y0 - BOT_RADIUS, 0):y1 + BOT_RADIUS + 1] = np.inf
+    cost[:BOT_RADIUS, :] = cost[-BOT_RADIUS:, :] = np.inf
+    cost[:, :BOT_RADIUS] = cost[:, -BOT_RADIUS:] = np.inf
+    if bot == "blue_bot":
+        cost[BLUE_MAX_X + 1:, :] = np.inf
+    else:
+        cost[:RED_MIN_X, :] = np.inf
+    cost.flags.writeable = False
+    return cost
+
+
+def distance_field(bot, goal):
+    """Get the cost for a bot to reach a goal from every grid point.
+
+    Args:
+        bot: The bot's name.
+        goal: The goal grid point, as integers.
+
+    Returns:
+        An array indexed [x, y], infinite where the goal is out of reach.
+    """
+    return _distance_field(bot, goal, layout_key())
+
+
+@lru_cache(maxsize=256)
+def _distance_field(bot, goal, key):
+    cost = _cost_grid(bot, key)
+    field = np.full(cost.shape, np.inf)
+    if not np.isfinite(cost[goal]):
+        return field
+    field[goal] = 0.0
+    queue = [(0.0, goal)]
+    while queue:
+        distance, (x, y) = heapq.heappop(queue)
+        if distance > field[x, y]:
+            continue
+        # Stepping from a neighbour onto (x, y) costs the length of the step
+        # times the cost of (x, y).
+        for dx, dy, length in STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx <= GRID_SIZE and 0 <= ny <= GRID_SIZE and np.isfinite(cost[nx, ny]):
+                candidate = distance + length * cost[x, y]
+                if candidate < field[nx, ny]:
+                    field[nx, ny] = candidate
+                    heapq.heappush(queue, (candidate, (nx, ny)))
+    field.flags.writeable = False
+    return field
+
+
+def find_path(bot, start, goal):
+    """Find a bot's cheapest path between two points.
+
+    Args:
+        bot: The bot's name.
+        start: Where the bot is, in grid coordinates.
+        goal: Where it should go, in grid coordinates.
+
+    Returns:
+        The waypoints from start to goal, including both, or None if the
+        bot cannot reach the goal.
+    """
+    corners = _corners(bot, _cell(start), _cell(goal), layout_key())
+    if corners is None:
+        return None
+    return [tuple(start)] + [tuple(float(v) for v in cell) for cell in corners] + [tuple(goal)]
+
+
+@lru_cache(maxsize=4096)
+def _corners(bot, start_cell, goal_cell, key):
+    """Get the grid points a path turns at, between its ends."""
+    cost = _cost_grid(bot, key)
+    field = _distance_field(bot, goal_cell, key)
+    if not np.isfinite(field[start_cell]):
+        return None
+
+    cells = [start_cell]
+    while cells[-1] != goal_cell:
+        x, y = cells[-1]
+        best = None
+        for dx, dy, length in STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx <= GRID_SIZE and 0 <= ny <= GRID_SIZE:
+                remaining = length * cost[nx, ny] + field[nx, ny]
+                if best is None or remaining < best[0]:
+                    best = (remaining, (nx, ny))
+        cells.append(best[1])
+
+    return tuple(_straighten(cells, cost, field)[1:-1])
+
+
+def precompute():
+    """Compute the fields for every load zone and barrier handoff point each
+    bot can reach, so routine moves never wait for one."""
+    goals = list(LOAD_ZONES.values()) + [(BLUE_MAX_X, GRID_SIZE // 2), (RED_MIN_X, GRID_SIZE // 2)]
+    for bot in BOTS:
+        for goal in goals:
+            if np.isfinite(cost_grid(bot)[_cell(goal)]):
+                distance_field(bot, _cell(goal))
+
+
+def _cell(point):
+    x, y = point
+    return (
+        int(min(max(round(x), 0), GRID_SIZE)),
+        int(min(max(round(y), 0), GRID_SIZE)),
+    )
+
+
+def _straighten(cells, cost, field):
+    """Replace runs of cells with straight lines that cost no more than the run."""
+    points = [cells[0]]
+    i = 0
+    while i < len(cells) - 1:
+        j = len(cells) - 1
+        while j > i + 1 and _line_cost(cells[i], cells[j], cost) > field[cells[i]] - field[cells[j]] + 1e-9:
+            j -= 1
+        points.append(cells[j])
+        i = j
+    return points
+
+
+def _line_cost(a, b, cost):
+    """Estimate the cost of driving straight between grid points by sampling it."""
+    length = math.hypot(b[0] - a[0], b[1] - a[1])
+    samples = int(length * 2) + 1
+    xs = np.rint(np.linspace(a[0], b[0], samples + 1)).astype(int)
+    ys = np.rint(np.linspace(a[1], b[1], samples + 1)).astype(int)
+    # Like the field, a step costs its length times the cost of where it lands.
+    return length * float(np.mean(cost[xs[1:], ys[1:]]))
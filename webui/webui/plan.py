@@ -0,0 +1,321 @@
+"""A compact representation of robot action plans.
+
+Plans are extracted from the AIScene code the model generates by reading
+its syntax tree, so nothing the model wrote is ever executed. A plan is a
+list of steps, and the actions of a step run at the same time, like the
+animations of one self.play call.
+"""
+
+import ast
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+BOTS = ("blue_bot", "red_bot")
+
+BOT_OPERATIONS = ("move_to_point", "pick_up_item", "place_item")
+
+# The Manim colors an item can have.
+ITEM_COLORS = (
+    "BLUE", "RED", "GREEN", "ORANGE", "PURPLE", "YELLOW", "TEAL",
+    "PINK", "GOLD", "MAROON", "GRAY", "WHITE", "BLACK",
+)
+
+# The longest a wait can last, in seconds. A wait still ties up a render
+# worker while its held frames are encoded, and lengthens the video.
+MAX_WAIT = 10
+
+
+def bot_name(bot):
+    """Get how answers refer to a bot, like "blue robot"."""
+    return bot.replace("_bot", " robot")
+
+
+class PlanError(ValueError):
+    """The code does not describe a plan."""
+
+
+@dataclass(frozen=True)
+class Action:
+    """A single robot action.
+
+    op is one of create_item, move_to_point, pick_up_item, place_item or wait.
+    """
+
+    op: str
+    bot: Optional[str] = None
+    item: Optional[str] = None
+    point: Optional[tuple] = None
+    color: Optional[str] = None
+    duration: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Plan:
+    steps: tuple
+
+    def actions(self):
+        return [action for step in self.steps for action in step]
+
+    def to_dict(self):
+        return {"steps": [[asdict(action) for action in step] for step in self.steps]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(
+            tuple(
+                Action(**{**action, "point": tuple(action["point"]) if action["point"] else None})
+                for action in step
+            )
+            for step in data["steps"]
+        ))
+
+    def segments(self, parts):
+        """Split the plan into contiguous segments that start at play steps.
+
+        Args:
+            parts: How many segments to aim for.
+
+        Returns:
+            A list of (index of the first step, segment) pairs.
+        """
+        plays = [i for i, step in enumerate(self.steps) if step[0].op in BOT_OPERATIONS]
+        parts = max(1, min(parts, len(plays)))
+        starts = [0] + [plays[round(k * len(plays) / parts)] for k in range(1, parts)]
+        ends = starts[1:] + [len(self.steps)]
+        return [(start, Plan(self.steps[start:end])) for start, end in zip(starts, ends)]
+
+    def summary(self):
+        """Describe the plan in one short line, leaving out the waits."""
+        steps = []
+        for step in self.steps:
+            descriptions = [_describe(action) for action in step if action.op != "wait"]
+            if descriptions:
+                steps.append(" + ".join(descriptions))
+        return "; ".join(steps)
+
+    def to_code(self):
+        """Write the plan back out as AIScene code."""
+        lines = [
+            "class AIScene(RobotScene):",
+            "    def construct(self):",
+            "        super().construct()",
+        ]
+        for step in self.steps:
+            first = step[0]
+            # Waits follow the step they pause after, as in the prompt examples.
+            if first.op != "wait":
+                lines.append("")
+            if first.op == "create_item":
+                lines.append(f"        {first.item} = Item(self, color={first.color}, position={_format_point(first.point)})")
+                lines.append(f"        self.add({first.item}.item)")
+            elif first.op == "wait":
+                lines.append(f"        self.wait({_format_number(first.duration)})")
+            else:
+                animations = ", ".join(_format_animation(action) for action in step)
+                lines.append(f"        self.play({animations})")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def from_code(cls, code):
+        """Extract the plan from generated AIScene code without running it.
+
+        Args:
+            code: The generated python source, optionally starting with the
+                language tag of its code fence.
+
+        Returns:
+            The plan.
+
+        Raises:
+            PlanError: The code is not valid python or does something a plan
+                cannot represent.
+        """
+        first_line, _, rest = code.lstrip().partition("\n")
+        if first_line.strip() in ("python", "python3", "py"):
+            code = rest
+
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            raise PlanError(f"the code is not valid python: {e}") from e
+
+        construct = _find_construct(tree)
+        items = set()
+        steps = []
+        for statement in construct.body:
+            step = _parse_statement(statement, items)
+            if step:
+                steps.append(step)
+        return cls(tuple(steps))
+
+
+def _find_construct(tree):
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == "AIScene":
+            for member in node.body:
+                if isinstance(member, ast.FunctionDef) and member.name == "construct":
+                    return member
+    raise PlanError("the code does not define AIScene.construct")
+
+
+def _parse_statement(statement, items):
+    """Turn one statement of construct into a step, or None if it does nothing
+    a plan needs to record."""
+    if isinstance(statement, ast.Assign):
+        return (_parse_create_item(statement, items),)
+
+    if not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call)):
+        raise _unsupported(statement)
+    call = statement.value
+
+    # super().construct()
+    if (
+        isinstance(call.func, ast.Attribute)
+        and call.func.attr == "construct"
+        and isinstance(call.func.value, ast.Call)
+        and isinstance(call.func.value.func, ast.Name)
+        and call.func.value.func.id == "super"
+    ):
+        return None
+
+    method = _self_method(call)
+    if method == "add":
+        # self.add(item.item) only shows an item create_item already made.
+        if len(call.args) == 1 and _item_name(call.args[0], items):
+            return None
+    elif method == "wait":
+        duration = _literal(call.args[0], statement) if call.args else 1
+        if not isinstance(duration, (int, float)) or isinstance(duration, bool):
+            raise _unsupported(statement)
+        if not 0 < duration <= MAX_WAIT:
+            raise PlanError(f"line {statement.lineno} waits {duration} seconds, not between 0 and {MAX_WAIT}")
+        return (Action("wait", duration=duration),)
+    elif method == "play":
+        actions = []
+        for animation in call.args:
+            actions.extend(_parse_animation(animation, items, statement))
+        if not actions:
+            raise _unsupported(statement)
+        return tuple(actions)
+    raise _unsupported(statement)
+
+
+def _parse_create_item(statement, items):
+    if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name):
+        raise _unsupported(statement)
+    call = statement.value
+    if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == "Item"):
+        raise _unsupported(statement)
+
+    # Item(self, color, position), with color and position optionally by keyword.
+    arguments = dict(zip(("scene", "color", "position"), call.args))
+    arguments.update({keyword.arg: keyword.value for keyword in call.keywords})
+    color = arguments.get("color")
+    if not (isinstance(color, ast.Name) and color.id.isupper()):
+        raise _unsupported(statement)
+    if color.id not in ITEM_COLORS:
+        raise PlanError(f"line {statement.lineno} uses {color.id}, which is not an item color")
+    if "position" not in arguments:
+        raise _unsupported(statement)
+
+    name = statement.targets[0].id
+    items.add(name)
+    return Action("create_item", item=name, color=color.id, point=_point(arguments["position"], statement))
+
+
+def _parse_animation(node, items, statement):
+    if not isinstance(node, ast.Call):
+        raise _unsupported(statement)
+
+    # AnimationGroup(a, b, ...) plays its animations together, like self.play(a, b).
+    if isinstance(node.func, ast.Name) and node.func.id == "AnimationGroup":
+        actions = []
+        for animation in node.args:
+            actions.extend(_parse_animation(animation, items, statement))
+        return actions
+
+    # self.<bot>.<operation>(...)
+    func = node.func
+    if not (
+        isinstance(func, ast.Attribute)
+        and func.attr in BOT_OPERATIONS
+        and isinstance(func.value, ast.Attribute)
+        and func.value.attr in BOTS
+        and isinstance(func.value.value, ast.Name)
+        and func.value.value.id == "self"
+        and node.args
+    ):
+        raise _unsupported(statement)
+
+    bot = func.value.attr
+    if func.attr == "pick_up_item":
+        item = _item_name(node.args[0], items)
+        if item is None:
+            raise _unsupported(statement)
+        return [Action("pick_up_item", bot=bot, item=item)]
+    return [Action(func.attr, bot=bot, point=_point(node.args[0], statement))]
+
+
+def _self_method(call):
+    func = call.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "self":
+        return func.attr
+    return None
+
+
+def _item_name(node, items):
+    """Get the item a node refers to, either as item or as item.item."""
+    if isinstance(node, ast.Attribute) and node.attr == "item":
+        node = node.value
+    if isinstance(node, ast.Name) and node.id in items:
+        return node.id
+    return None
+
+
+def _point(node, statement):
+    point = _literal(node, statement)
+    if not (
+        isinstance(point, (tuple, list))
+        and len(point) == 2
+        and all(isinstance(value, (int, float)) for value in point)
+    ):
+        raise _unsupported(statement)
+    return tuple(point)
+
+
+def _literal(node, statement):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError):
+        raise _unsupported(statement)
+
+
+def _unsupported(statement):
+    return PlanError(f"line {statement.lineno} is not a plan action: {ast.unparse(statement)}")
+
+
+def _describe(action):
+    if action.op == "create_item":
+        return f"create {action.item} at {_format_point(action.point)}"
+    bot = action.bot.replace("_bot", "")
+    if action.op == "move_to_point":
+        return f"{bot} moves to {_format_point(action.point)}"
+    if action.op == "pick_up_item":
+        return f"{bot} picks up {action.item}"
+    return f"{bot} places at {_format_point(action.point)}"
+
+
+def _format_number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _format_point(point):
+    return "(" + ", ".join(_format_number(value) for value in point) + ")"
+
+
+def _format_animation(action):
+    if action.op == "pick_up_item":
+        argument = action.item
+    else:
+        argument = _format_point(action.point)
+    return f"self.{action.bot}.{action.op}({argument})"
@@ -0,0 +1,63 @@
+"""The chat prompt, with a prefix that is built once and never changes."""
+
+import hashlib
+
+from langchain.schema import HumanMessage, SystemMessage
+
+from webui.layout import BARRIER_X, BLUE_MAX_X, BLUE_START, GRID_SIZE, LOAD_ZONES, OBSTACLES, RED_MIN_X, RED_START
+from webui.pathing import BOT_RADIUS
+
+HUMAN_TEMPLATE = "Prompt: An object has been loaded at load zone D, and it needs to move to load zone A. Prompt: {text}"
+
+
+def layout_facts():
+    """Describe the floor layout for the model."""
+    zones = ", ".join(f"{name} at {point}" for name, point in LOAD_ZONES.items())
+    obstacles = "".join(
+        f" An obstacle covers x = {x0} to {x1}, y = {y0} to {y1}; robots drive around it but cannot stop on it."
+        for x0, y0, x1, y1 in OBSTACLES
+    )
+    return (
+        f"Layout facts: the load zones are centered at {zones}. "
+        f"The barrier is the line x = {BARRIER_X}. "
+        f"The blue robot starts at {BLUE_START} and cannot go to the right side of the barrier, past x = {BLUE_MAX_X}. "
+        f"The red robot starts at {RED_START} and cannot go to the left side of the barrier, past x = {RED_MIN_X}. "
+        f"Robots stay on the floor, with x and y from {BOT_RADIUS} to {GRID_SIZE - BOT_RADIUS}."
+        + obstacles
+    )
+
+
+class PromptBuilder:
+    """Assembles the messages for a request.
+
+    The system prompt and layout facts form a prefix that is built once and
+    is byte-identical for every request, so provider-side and local prefix
+    caches can key on it. A request only appends its worked examples,
+    history and question.
+
+    Args:
+        system_prompt: The instructions for the model.
+        facts: Facts about the floor that every request shares.
+        human_template: The template of the user's turn, with a {text} field.
+    """
+
+    def __init__(self, system_prompt, facts, human_template):
+        self.prefix = (SystemMessage(content=system_prompt + "\n" + facts),)
+        self.prefix_key = hashlib.sha256(self.prefix[0].content.encode()).hexdigest()
+        self.human_template = human_template
+
+    def build(self, history, question, examples=()):
+        """Get the messages for a question.
+
+        Args:
+            history: The history messages, oldest first.
+            question: The user's question.
+            examples: The worked examples to show, most relevant first.
+        """
+        tail = []
+        if examples:
+            shown = "\n\n".join(f'Example prompt: "{example.prompt}"\n\n{example.answer}' for example in examples)
+            tail.append(SystemMessage(content="Worked examples:\n\n" + shown))
+        tail.extend(history)
+        tail.append(HumanMessage(content=self.human_template.format(text=question)))
+        return [*self.prefix, *tail]
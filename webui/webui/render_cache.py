@@ -0,0 +1,119 @@
+"""A persistent cache of rendered videos keyed on action plan and render config."""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from manim import config
+
+from webui.layout import layout_key
+
+
+def render_settings(quality=None):
+    """Get the manim config values that change what a render looks like.
+
+    Args:
+        quality: Config values the render overrides, such as a quality tier.
+    """
+    settings = {
+        "pixel_width": config.pixel_width,
+        "pixel_height": config.pixel_height,
+        "frame_rate": config.frame_rate,
+        "background_color": str(config.background_color),
+    }
+    settings.update(quality or {})
+    return settings
+
+
+def scene_key(plan, settings):
+    """Hash an action plan and render settings into a cache key.
+
+    The floor layout is part of the key, as the bots drive around it.
+
+    Args:
+        plan: The plan to render.
+        settings: The render settings, as returned by render_settings.
+
+    Returns:
+        The hex digest identifying the render.
+    """
+    payload = json.dumps({"plan": plan.to_dict(), "settings": settings, "layout": layout_key()}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RenderCache:
+    """Rendered mp4s on disk with least recently used eviction.
+
+    The index maps each key to the size and last use time of its video and is
+    kept next to the videos, so the cache survives restarts.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, "index.json")
+        self.index = self._load_index()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key + ".mp4")
+
+    def get(self, key):
+        """Look up a render.
+
+        Returns:
+            The path of the cached mp4, or None on a miss.
+        """
+        entry = self.index.get(key)
+        if entry is None or not os.path.exists(self.path_for(key)):
+            self.index.pop(key, None)
+            self.misses += 1
+            return None
+        entry["used"] = time.time()
+        self._save_index()
+        self.hits += 1
+        return self.path_for(key)
+
+    def put(self, key, source_path):
+        """Copy a rendered mp4 into the cache.
+
+        Returns:
+            The path of the cached copy.
+        """
+        path = self.path_for(key)
+        partial = path + ".part"
+        shutil.copyfile(source_path, partial)
+        os.replace(partial, path)
+        self.index[key] = {"size": os.path.getsize(path), "used": time.time()}
+        self._evict()
+        self._save_index()
+        return path
+
+    def size(self):
+        return sum(entry["size"] for entry in self.index.values())
+
+    def _evict(self):
+        total = self.size()
+        for key in sorted(self.index, key=lambda k: self.index[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index.pop(key)["size"]
+            if os.path.exists(self.path_for(key)):
+                os.remove(self.path_for(key))
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        partial = self._index_path + ".part"
+        with open(partial, "w") as f:
+            json.dump(self.index, f)
+        os.replace(partial, self._index_path)
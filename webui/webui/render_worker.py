@@ -0,0 +1,316 @@
+"""A pool of worker processes that renders generated scenes off the event loop."""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from manim import config, tempconfig
+
+from webui.grid_scene import PlanScene
+from webui.pathing import precompute
+from webui.render_cache import render_settings
+from webui.simulator import simulate
+from webui.streaming import Playlist, SegmentWriter
+
+
+def render_scene(plan, output_name, quality=None, start=None, segment_store=None, stream=None, work_dir=None):
+    """Render an action plan inside a worker process.
+
+    Args:
+        plan: The plan to play.
+        output_name: The file name of the rendered movie, without extension.
+        quality: Manim config values to render with, such as a quality tier.
+        start: The floor state to start from, when rendering a segment.
+        segment_store: The SegmentStore to reuse animations from.
+        stream: The stream directory and part index to write HLS segments
+            to as animations finish.
+        work_dir: A directory of the render's own to write the movie and its
+            partial movies in, so concurrent renders of the same scene do
+            not share files.
+
+    Returns:
+        The path of the rendered mp4, and a dict counting its frames and
+        the segments reused from and added to the store.
+    """
+    stats = {"frames": 0, "segment_hits": 0, "segment_misses": 0}
+    overrides = {**(quality or {}), "output_file": output_name}
+    if work_dir is not None:
+        overrides["video_dir"] = os.path.abspath(work_dir)
+    with tempconfig(overrides):
+        if segment_store is not None:
+            settings = render_settings()
+            directory = segment_store.checkout(settings)
+            config.partial_movie_dir = os.path.abspath(directory)
+            # The store does its own eviction.
+            config.max_files_cached = 2**31
+
+        scene = PlanScene(plan, start)
+        if segment_store is not None:
+            scene.segment_lookup = functools.partial(segment_store.link, directory, settings)
+        if stream is not None:
+            scene.stream = SegmentWriter(*stream)
+        scene.render()
+        if stream is not None:
+            scene.stream.close()
+        stats["frames"] = round(scene.renderer.time * config.frame_rate)
+
+        if segment_store is not None:
+            used = [path for path in scene.renderer.file_writer.partial_movie_files if path]
+            stats["segment_hits"], stats["segment_misses"] = segment_store.checkin(directory, settings, used)
+        return str(scene.renderer.file_writer.movie_file_path), stats
+
+
+def concat_movies(paths, output_path):
+    """Join movies end to end without re-encoding them, and delete the parts."""
+    list_path = output_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    subprocess.run(
+        [
+            shutil.which("ffmpeg"), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", output_path,
+        ],
+        check=True,
+    )
+    os.remove(list_path)
+    for path in paths:
+        os.remove(path)
+    return output_path
+
+
+class RenderJob:
+    """A submitted render and its outcome."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        # One of "queued", "rendering", "done" or "failed".
+        self.status = "queued"
+        self.segments = 1
+        self.segments_done = 0
+        self.path = None
+        self.error = None
+        self.task = None
+        # The HLS playlist the render streams to, if any.
+        self.playlist = None
+        # The longest any segment waited for a worker, and the render_scene
+        # stats summed over the segments.
+        self.stats = {"queue_wait": 0.0, "frames": 0, "segment_hits": 0, "segment_misses": 0}
+
+    def describe(self):
+        description = self.status
+        if self.status == "rendering" and self.segments > 1:
+            description = f"rendering ({self.segments_done}/{self.segments} segments)"
+        if self.status == "rendering" and self.playlist is not None and self.playlist.segments:
+            description += f", {self.playlist.segments} animations streamed"
+        return description
+
+
+class RenderPool:
+    """A render job queue served by a pool of worker processes.
+
+    At most max_workers scenes render at once, the rest wait in the queue.
+    A plan with several animations is split into segments that render in
+    parallel from their simulated start states and are joined afterwards.
+
+    Every job works in its own directory under its session's directory in
+    work_root, and its movie is named after the job and kept there until
+    it is discarded.
+    """
+
+    def __init__(self, max_workers=None, min_plays_per_segment=2, segment_store=None, work_root="render_work"):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_plays_per_segment = min_plays_per_segment
+        self.segment_store = segment_store
+        self.work_root = work_root
+        self.jobs = {}
+        self._executor = None
+        self._slots = None
+
+    def submit(self, plan, quality=None, stream_dir=None, session="shared"):
+        """Queue a plan for rendering.
+
+        Args:
+            plan: The plan to play.
+            quality: Manim config values to render with, such as a quality tier.
+            stream_dir: A directory to stream the render to as HLS while it
+                runs. Streaming needs ffmpeg and is skipped without it.
+            session: The session the job renders for.
+
+        Returns:
+            The id of the new job.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=precompute,
+            )
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        job = RenderJob(uuid.uuid4().hex)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, plan, quality, stream_dir, session))
+        return job.id
+
+    def status(self, job_id):
+        """Get the status of a job."""
+        return self.jobs[job_id].status
+
+    def playlist(self, job_id):
+        """Get a job's streaming.Playlist, once it lists a segment."""
+        playlist = self.jobs[job_id].playlist
+        if playlist is None or not playlist.segments:
+            return None
+        return playlist
+
+    async def watch(self, job_id, interval=0.5):
+        """Yield a description of a job every time it changes, until it finishes."""
+        job = self.jobs[job_id]
+        last = None
+        while True:
+            if job.describe() != last:
+                last = job.describe()
+                yield last
+            if job.task.done():
+                return
+            await asyncio.wait([job.task], timeout=interval)
+
+    async def result(self, job_id):
+        """Wait for a job and forget it.
+
+        Returns:
+            The path of the rendered mp4, which the caller hands to discard
+            once done with it, and the job's stats.
+
+        Raises:
+            Exception: Whatever the render raised in the worker.
+        """
+        job = self.jobs[job_id]
+        await asyncio.shield(job.task)
+        del self.jobs[job_id]
+        if job.error is not None:
+            raise job.error
+        return job.path, job.stats
+
+    def cancel(self, job_id):
+        """Forget a job nobody is waiting for.
+
+        A queued job never starts. A running render finishes in its worker,
+        but the result is dropped.
+        """
+        job = self.jobs.pop(job_id)
+        job.task.cancel()
+        if job.task.done() and job.path is not None:
+            self.discard(job.path)
+
+    def discard(self, path):
+        """Delete a job's mp4 with its working directory, and the session's
+        directory once no other job of the session uses it."""
+        work_dir = os.path.dirname(path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(work_dir))
+        except OSError:
+            pass
+
+    def split(self, plan):
+        """Split a plan into the segments to render in parallel.
+
+        Returns:
+            A list of (index of the first step, segment) pairs.
+        """
+        if shutil.which("ffmpeg") is None:
+            return [(0, plan)]
+        plays = sum(1 for step in plan.steps if step[0].op not in ("create_item", "wait"))
+        return plan.segments(min(self.max_workers, plays // self.min_plays_per_segment))
+
+    async def _run(self, job, plan, quality, stream_dir, session):
+        work_dir = os.path.join(self.work_root, session, job.id)
+        output_path = os.path.join(work_dir, job.id + ".mp4")
+        segments = self.split(plan)
+        job.segments = len(segments)
+        streams = [None] * len(segments)
+        poller = None
+        if stream_dir is not None and shutil.which("ffmpeg") is not None:
+            job.playlist = Playlist(stream_dir, len(segments))
+            streams = [(stream_dir, i) for i in range(len(segments))]
+            poller = asyncio.create_task(self._poll_playlist(job.playlist))
+        try:
+            # Each part renders in a directory of its own, as Manim names the
+            # partial movie directory after the scene.
+            if len(segments) == 1:
+                path = await self._render(job, plan, job.id, quality, os.path.join(work_dir, "0"), stream=streams[0])
+                job.path = shutil.move(path, output_path)
+            else:
+                states = simulate(plan).states
+                # Every part has to finish before a failure is raised, as the
+                # others are still writing into the work directory.
+                paths = await asyncio.gather(*(
+                    self._render(
+                        job, segment, f"{job.id}_{i}", quality, os.path.join(work_dir, str(i)), states[start], streams[i]
+                    )
+                    for i, (start, segment) in enumerate(segments)
+                ), return_exceptions=True)
+                errors = [path for path in paths if isinstance(path, BaseException)]
+                if errors:
+                    raise errors[0]
+                loop = asyncio.get_running_loop()
+                job.path = await _finish(loop.run_in_executor(None, concat_movies, paths, output_path))
+            if self.segment_store is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.segment_store.evict)
+            job.status = "done"
+        except Exception as e:
+            job.error = e
+            job.status = "failed"
+        finally:
+            if poller is not None:
+                poller.cancel()
+                job.playlist.update()
+            # Failed and cancelled jobs leave nothing behind.
+            if job.status != "done":
+                self.discard(output_path)
+                job.path = None
+            else:
+                for i in range(len(segments)):
+                    shutil.rmtree(os.path.join(work_dir, str(i)), ignore_errors=True)
+
+    async def _poll_playlist(self, playlist, interval=0.2):
+        """Keep a playlist listing the segments the workers have finished."""
+        while True:
+            playlist.update()
+            await asyncio.sleep(interval)
+
+    async def _render(self, job, plan, output_name, quality, work_dir, start=None, stream=None):
+        queued = time.monotonic()
+        async with self._slots:
+            job.stats["queue_wait"] = max(job.stats["queue_wait"], time.monotonic() - queued)
+            job.status = "rendering"
+            loop = asyncio.get_running_loop()
+            path, stats = await _finish(loop.run_in_executor(
+                self._executor, render_scene, plan, output_name, quality, start, self.segment_store, stream, work_dir
+            ))
+            for name, value in stats.items():
+                job.stats[name] += value
+            job.segments_done += 1
+            return path
+
+
+async def _finish(future):
+    """Wait for an executor future, and keep waiting if cancelled.
+
+    A worker carries on writing into the job's work directory after the
+    job is cancelled, so the directory is only deleted once it stops.
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
@@ -0,0 +1,94 @@
+"""A local cache of model responses, keyed on the normalized request."""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+
+
+def normalize_question(question):
+    """Fold away differences that do not change a request's meaning, like
+    case, spacing and trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip(".!?").strip().lower()
+
+
+def request_key(question, history, model_name, prefix_key, examples=()):
+    """Hash everything the model's answer depends on.
+
+    Args:
+        question: The user's question.
+        history: The compressed history messages sent with it.
+        model_name: The model answering.
+        prefix_key: The hash of the fixed prompt prefix.
+        examples: The worked examples shown with it.
+    """
+    payload = json.dumps({
+        "question": normalize_question(question),
+        "history": [[message.type, message.content] for message in history],
+        "model": model_name,
+        "prefix": prefix_key,
+        "examples": [[example.prompt, example.answer] for example in examples],
+    })
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Model responses in SQLite, expiring after a time to live and evicting
+    the least recently used beyond max_entries.
+
+    Args:
+        path: The database file.
+        ttl: How many seconds a response stays valid.
+        max_entries: How many responses to keep at most.
+        bypass: Whether to skip lookups, so every request reaches the model.
+    """
+
+    def __init__(self, path, ttl, max_entries, bypass=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT, created REAL, used REAL)"
+        )
+        self.db.commit()
+
+    def get(self, key):
+        """Look up a response.
+
+        Returns:
+            The response text, or None on a miss or when bypassed.
+        """
+        if self.bypass:
+            return None
+        now = time.time()
+        row = self.db.execute(
+            "SELECT response FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, response, now, now)
+        )
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        self.db.execute("DELETE FROM responses WHERE created <= ?", (time.time() - self.ttl,))
+        self.db.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
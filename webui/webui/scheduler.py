@@ -0,0 +1,81 @@
+"""Scheduling plans so both bots work at the same time.
+
+Generated plans play one action at a time, so one bot idles while the
+other drives. The scheduler keeps only the orderings a plan depends on:
+
+* each bot's own actions stay in order, so it picks up, carries and
+  places in the sequence it was told to,
+* picking up an item waits for the place that put it there, like the red
+  robot taking over an item the blue robot left at the barrier,
+* placing an item on a spot another item was taken from waits for that
+  pickup, so the schedule never stacks items the plan kept apart,
+
+and plays every action in the earliest step those allow, with one action
+per bot per step. Every bot action takes one play, so this schedule is as
+short as possible: its length is the longest chain of dependent actions.
+Waits between plays are dropped, and items are created before the first
+play.
+"""
+
+from webui.plan import BOT_OPERATIONS, Plan
+
+
+def dependencies(plan):
+    """Find what every bot action has to wait for.
+
+    Returns:
+        The bot actions in plan order, and for each the set of indices of
+        the actions it has to follow.
+    """
+    actions = [action for action in plan.actions() if action.op in BOT_OPERATIONS]
+    last_by_bot = {}
+    # The index of the place that last put each item down.
+    last_place = {}
+    # Where each item was put down, and the index of the pickup that last
+    # cleared each spot.
+    spots = {}
+    cleared = {}
+    held = {}
+    depends = []
+    for i, action in enumerate(actions):
+        before = set()
+        if action.bot in last_by_bot:
+            before.add(last_by_bot[action.bot])
+        if action.op == "pick_up_item":
+            if action.item in last_place:
+                before.add(last_place[action.item])
+            if action.item in spots:
+                cleared[spots.pop(action.item)] = i
+            held[action.bot] = action.item
+        elif action.op == "place_item" and action.bot in held:
+            if action.point in cleared:
+                before.add(cleared[action.point])
+            item = held.pop(action.bot)
+            last_place[item] = i
+            spots[item] = action.point
+        last_by_bot[action.bot] = i
+        depends.append(before)
+    return actions, depends
+
+
+def schedule(plan):
+    """Merge independent actions into shared steps.
+
+    Returns:
+        The scheduled plan.
+    """
+    actions, depends = dependencies(plan)
+    levels = []
+    for before in depends:
+        levels.append(max((levels[j] + 1 for j in before), default=0))
+
+    plays = [[] for _ in range(max(levels, default=-1) + 1)]
+    for action, level in zip(actions, levels):
+        plays[level].append(action)
+
+    steps = [(action,) for action in plan.actions() if action.op == "create_item"]
+    steps += [tuple(play) for play in plays]
+    # Keep a closing pause, so the video does not end on the last move.
+    if plan.steps and plan.steps[-1][0].op == "wait":
+        steps.append(plan.steps[-1])
+    return Plan(tuple(steps))
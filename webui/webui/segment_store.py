@@ -0,0 +1,103 @@
+"""A store of Manim partial movie files shared by every render.
+
+Manim names each animation's partial movie after a hash of the animation
+and the scene state, and skips rendering animations whose file already
+exists. Keeping those files across requests and sessions means common
+moves, like a robot driving from its start to a load zone, are rendered
+once and stitched into many videos.
+
+Every render works in its own directory, because Manim writes its
+concatenation list to a fixed name in the partial movie directory. A stored
+segment is linked into it when the render looks the segment up, so a
+render costs the same however large the store is. New segments are moved
+into the store when the render finishes.
+"""
+
+import os
+import shutil
+import uuid
+
+from webui.layout import layout_key
+
+
+class SegmentStore:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def shelf(self, quality):
+        """Get the directory holding the segments of one quality.
+
+        Args:
+            quality: The manim config values the render uses.
+        """
+        name = "{pixel_width}x{pixel_height}p{frame_rate}".format(**quality)
+        return os.path.join(self.root, f"{layout_key()}_{name}")
+
+    def checkout(self, quality):
+        """Make an empty working partial movie directory for one render."""
+        directory = os.path.join(self.root, ".work", uuid.uuid4().hex)
+        os.makedirs(self.shelf(quality), exist_ok=True)
+        os.makedirs(directory)
+        return directory
+
+    def link(self, directory, quality, name):
+        """Link a stored segment into a working directory, if it is stored.
+
+        Args:
+            directory: The directory from checkout.
+            quality: The manim config values the render uses.
+            name: The segment's file name.
+        """
+        stored = os.path.join(self.shelf(quality), name)
+        target = os.path.join(directory, name)
+        if os.path.exists(stored) and not os.path.lexists(target):
+            os.symlink(os.path.abspath(stored), target)
+
+    def checkin(self, directory, quality, used):
+        """Keep the new segments of a finished render and drop its directory.
+
+        Args:
+            directory: The directory from checkout.
+            quality: The manim config values the render used.
+            used: The partial movie files the render used.
+
+        Returns:
+            A (hits, misses) pair counting the used segments that were
+            already stored and the ones that were rendered.
+        """
+        shelf = self.shelf(quality)
+        hits = misses = 0
+        for path in used:
+            if os.path.islink(path):
+                hits += 1
+                # Mark the segment as recently used.
+                os.utime(os.path.realpath(path))
+            elif os.path.exists(path):
+                misses += 1
+                os.replace(path, os.path.join(shelf, os.path.basename(path)))
+        shutil.rmtree(directory, ignore_errors=True)
+        return hits, misses
+
+    def size(self):
+        return sum(os.path.getsize(path) for path in self._segments())
+
+    def evict(self):
+        """Delete least recently used segments until the store fits in max_bytes."""
+        segments = sorted(self._segments(), key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in segments)
+        for path in segments:
+            if total <= self.max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+    def _segments(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            os.path.join(self.root, shelf, name)
+            for shelf in os.listdir(self.root)
+            if shelf != ".work"
+            for name in os.listdir(os.path.join(self.root, shelf))
+        ]
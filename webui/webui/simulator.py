@@ -0,0 +1,184 @@
+"""A headless simulator that checks action plans before they are rendered.
+
+It steps the bots and items through a plan with the same rules as Bot in
+grid_scene, without Manim, and reports everything that would fail or break
+the floor rules.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from webui.layout import (
+    BARRIER_X,
+    BLUE_MAX_X,
+    BLUE_START,
+    GRID_SIZE,
+    LOAD_ZONE_SIZE,
+    LOAD_ZONES,
+    RED_MIN_X,
+    RED_START,
+    SCENE_SIZE,
+)
+from webui.pathing import BOT_RADIUS, find_path
+from webui.plan import BOTS, bot_name
+
+# Grid units per scene unit. Bot._is_close_to measures in scene units.
+GRID_PER_SCENE = GRID_SIZE / SCENE_SIZE
+
+# How far a bot reaches to pick up an item, in grid units per axis.
+PICKUP_RANGE = 1 * GRID_PER_SCENE
+
+ZONE_CENTERS = np.array(list(LOAD_ZONES.values()), dtype=float)
+ZONE_HALF_EXTENTS = np.array(LOAD_ZONE_SIZE, dtype=float) * GRID_PER_SCENE / 2
+
+
+@dataclass
+class Violation:
+    step: int
+    kind: str
+    message: str
+
+
+class FloorState:
+    """Where the bots and items are and who holds what."""
+
+    def __init__(self):
+        # One row per bot, in the order of plan.BOTS.
+        self.bots = np.array([BLUE_START, RED_START], dtype=float)
+        self.items = np.zeros((0, 2))
+        self.item_names = []
+        self.item_colors = []
+        # The index of the item each bot holds, or -1.
+        self.held = np.full(len(BOTS), -1)
+
+    def copy(self):
+        state = FloorState()
+        state.bots = self.bots.copy()
+        state.items = self.items.copy()
+        state.item_names = list(self.item_names)
+        state.item_colors = list(self.item_colors)
+        state.held = self.held.copy()
+        return state
+
+    def bot_position(self, bot):
+        return tuple(self.bots[BOTS.index(bot)])
+
+    def item_position(self, item):
+        return tuple(self.items[self.item_names.index(item)])
+
+    def holder(self, item):
+        """Get the bot holding an item, or None."""
+        index = self.item_names.index(item)
+        for bot, held in zip(BOTS, self.held):
+            if held == index:
+                return bot
+        return None
+
+
+class Simulation:
+    """The outcome of stepping through a plan.
+
+    states[i] is the floor before step i, and states[-1] the floor at the end.
+    """
+
+    def __init__(self, states, violations):
+        self.states = states
+        self.violations = violations
+
+    @property
+    def ok(self):
+        return not self.violations
+
+    def report(self):
+        return "\n".join(f"step {v.step + 1}: {v.message}" for v in self.violations)
+
+
+def simulate(plan, state=None):
+    """Step through a plan.
+
+    Args:
+        plan: The plan to check.
+        state: The floor to start from, the initial layout by default.
+
+    Returns:
+        The simulation.
+    """
+    state = state.copy() if state is not None else FloorState()
+    states = [state.copy()]
+    violations = []
+    for step_index, step in enumerate(plan.steps):
+        for action in step:
+            problem = _apply(state, action)
+            if problem is not None:
+                violations.append(Violation(step_index, *problem))
+        states.append(state.copy())
+    return Simulation(states, violations)
+
+
+def in_load_zone(point):
+    """Get the name of the load zone a point lies in, or None."""
+    inside = np.all(np.abs(ZONE_CENTERS - np.asarray(point, dtype=float)) <= ZONE_HALF_EXTENTS, axis=1)
+    if not inside.any():
+        return None
+    return list(LOAD_ZONES)[int(np.argmax(inside))]
+
+
+def _apply(state, action):
+    """Apply one action to the floor.
+
+    Returns:
+        A (kind, message) pair if the action breaks a rule, otherwise None.
+    """
+    if action.op == "create_item":
+        state.items = np.vstack([state.items, action.point])
+        state.item_names.append(action.item)
+        state.item_colors.append(action.color)
+        return None
+    if action.op == "wait":
+        return None
+
+    bot = BOTS.index(action.bot)
+    held = state.held[bot]
+
+    if action.op == "move_to_point":
+        point = np.asarray(action.point, dtype=float)
+        start = tuple(state.bots[bot])
+        state.bots[bot] = point
+        if held >= 0:
+            state.items[held] = point
+        if action.bot == "blue_bot" and point[0] > BLUE_MAX_X:
+            return "barrier", f"the blue robot moves to x = {point[0]:g}, past x = {BLUE_MAX_X}"
+        if action.bot == "red_bot" and point[0] < RED_MIN_X:
+            return "barrier", f"the red robot moves to x = {point[0]:g}, past x = {RED_MIN_X}"
+        if np.any(point < BOT_RADIUS) or np.any(point > GRID_SIZE - BOT_RADIUS):
+            return "edge", (
+                f"the {bot_name(action.bot)} moves to {action.point}, closer than {BOT_RADIUS} to the edge of the floor"
+            )
+        if find_path(action.bot, start, action.point) is None:
+            return "path", f"the {bot_name(action.bot)} has no way around the obstacles to {action.point}"
+        return None
+
+    if action.op == "pick_up_item":
+        item = state.item_names.index(action.item)
+        if held >= 0:
+            return "pickup", f"the {bot_name(action.bot)} picks up {action.item} while holding {state.item_names[held]}"
+        if item in state.held:
+            other = BOTS[int(np.argmax(state.held == item))]
+            return "pickup", f"the {bot_name(action.bot)} picks up {action.item}, which the {bot_name(other)} holds"
+        if np.any(np.abs(state.bots[bot] - state.items[item]) > PICKUP_RANGE):
+            return "pickup", f"the {bot_name(action.bot)} is too far from {action.item} to pick it up"
+        state.held[bot] = item
+        state.items[item] = state.bots[bot]
+        return None
+
+    if action.op == "place_item":
+        if held < 0:
+            return "place", f"the {bot_name(action.bot)} places an item without holding one"
+        state.held[bot] = -1
+        state.items[held] = action.point
+        if action.point[0] != BARRIER_X and in_load_zone(action.point) is None:
+            return "place", f"the {bot_name(action.bot)} places {state.item_names[held]} at {action.point}, outside the load zones and the barrier"
+        return None
+
+    return "unknown", f"unknown action {action.op}"
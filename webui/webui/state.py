@@ -1,59 +1,101 @@
+import hashlib
+import json
 import os
+import shutil
+import time
+import uuid
 import reflex as rx
 from dotenv import load_dotenv
-from langchain.prompts.chat import ChatPromptTemplate
-from langchain.schema import BaseOutputParser
-from langchain_openai import ChatOpenAI
 from webui import styles
 from webui.components import loading_icon
-import shutil
-import time
-from webui.grid_scene import *
+from webui.assets import ASSETS_DIR, AssetStore, asset_url, wait_until_servable
+from webui.batch_planner import describe_orders, is_batch, parse_orders, plan_orders
+from webui.examples import default_index
+from webui.grid_scene import QUALITY_TIERS
+from webui.history import HistoryManager
+from webui.llm_backend import make_backend
+from webui.parsing import StreamingCodeParser
+from webui.plan import Plan, PlanError
+from webui.prompt import HUMAN_TEMPLATE, PromptBuilder, layout_facts
+from webui.simulator import simulate
+from webui.render_cache import RenderCache, render_settings, scene_key
+from webui.render_worker import RenderPool
+from webui.response_cache import ResponseCache, request_key
+from webui.scheduler import schedule
+from webui.segment_store import SegmentStore
 from webui.template import Template
+from webui.tracing import Trace, metrics
+from webui.trajectory import build_trajectory, to_svg
 
 temp = Template()
 
 load_dotenv()
 
-api_key = os.getenv('OPENAI_API_KEY')
-
-class CodeParser(BaseOutputParser):
-    def parse(self, text: str):
-        return text.strip().split("```")
-    
-def format_history(chats):
-    formatted_messages = []
-    for chat in chats:
-        question = "User: " + str(chat.question)
-        answer = "Assistant: " + str(chat.answer)
-        formatted_messages.extend((question, answer))
-    return formatted_messages
-
-human_template = "Prompt: The blue robot cannot go to the right side of the barrier. The red robot cannot go to the left side of the barrier. An object has been loaded at load zone D, and it needs to move to load zone A. Prompt: {text}"
-
-template = temp.return_template()
-model = ChatOpenAI(model = 'gpt-3.5-turbo', openai_api_key = api_key)
+history = HistoryManager(int(os.getenv('HISTORY_TOKEN_BUDGET', '1500')))
+
+# Show a quick draft render before the final one.
+progressive_render = os.getenv('PROGRESSIVE_RENDER', '1') == '1'
+
+# Stream final renders as HLS while they run, so the video starts after the
+# first animation. A draft is not needed then. Streaming needs ffmpeg.
+stream_renders = os.getenv('STREAM_RENDERS', '1') == '1' and shutil.which('ffmpeg') is not None
+
+# Play independent actions of the two bots at the same time.
+schedule_plans = os.getenv('SCHEDULE_PLANS', '1') == '1'
+
+# Plan requests with several transfer orders without the model.
+batch_planning = os.getenv('BATCH_PLANNING', '1') == '1'
+
+# "video" renders every answer with Manim. "trajectory" animates it in the
+# browser instead, and renders a video only when asked to export one.
+output_mode = os.getenv('OUTPUT_MODE', 'video')
+
+prompt = PromptBuilder(temp.return_template(), layout_facts(), HUMAN_TEMPLATE)
+example_index = default_index()
+model = make_backend(example_index, temp.return_example_answer())
+response_cache = ResponseCache(
+    os.getenv('LLM_CACHE_PATH', 'llm_cache.db'),
+    ttl=float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600))),
+    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000')),
+    bypass=os.getenv('LLM_CACHE_BYPASS') == '1',
+)
+few_shot_examples = int(os.getenv('FEW_SHOT_EXAMPLES', '2'))
+render_pool = RenderPool(
+    segment_store=SegmentStore(
+        os.getenv('SEGMENT_STORE_DIR', 'segment_store'),
+        int(os.getenv('SEGMENT_STORE_MAX_MB', '4096')) * 2**20,
+    ),
+    work_root=os.getenv('RENDER_WORK_DIR', 'render_work'),
+)
+render_cache = RenderCache(
+    os.getenv('RENDER_CACHE_DIR', 'render_cache'),
+    int(os.getenv('RENDER_CACHE_MAX_MB', '2048')) * 2**20,
+)
+# The root has to be inside the assets directory to be served.
+asset_store = AssetStore(
+    os.getenv('ASSET_STORE_DIR', os.path.join(ASSETS_DIR, 'sessions')),
+    int(os.getenv('ASSET_STORE_MAX_MB', '1024')) * 2**20,
+    max_age=float(os.getenv('ASSET_MAX_AGE', '3600')),
+    session_ttl=float(os.getenv('ASSET_SESSION_TTL', str(24 * 3600))),
+)
 
 class QA(rx.Base):
     """A question and answer pair."""
 
     question: str
     answer: str
-    
-class ImageURL():
-    
-    def __init__(self):
-        self.file_version = 0
-        self.filename = "AIScene_0.mp4"
-        self.fileaddr = "/" + self.filename
-    
-    def update_file(self):
-        self.file_version += 1
-        self.filename = f"AIScene_{self.file_version}.mp4"
-        self.fileaddr = "/" + self.filename
-    
-        
-img = ImageURL()
+    # How long each stage of answering took, one stage per line.
+    timings: list[str] = []
+    # The plan the answer describes, as JSON.
+    plan: str = ""
+    # The answer's animation as SVG, in the trajectory output mode.
+    animation: str = ""
+    # The URL of the answer's rendered video.
+    video: str = ""
+    # Whether the answer's video is still on its way. It can show while
+    # processing goes on, like the stream of a render that is running.
+    rendering: bool = False
+
 
 DEFAULT_CHATS = {
     "Demo": [],
@@ -68,6 +110,17 @@ def add_br_tags(input_string):
     return '\n'.join(lines_with_br)
 
 
+def format_answer(reason, code):
+    answer_text = add_br_tags(reason)
+    if code:
+        answer_text += rf"""
+```python3
+{code}
+```
+"""
+    return answer_text
+
+
 class State(rx.State):
     """The app state."""
 
@@ -97,6 +150,9 @@ class State(rx.State):
     
     url:str = ""
 
+    # The status of the render behind the current answer.
+    render_status: str = ""
+
     def create_chat(self):
         """Create a new chat."""
         # Add the new chat to the list of chats.
@@ -121,6 +177,9 @@ class State(rx.State):
 
     def delete_chat(self):
         """Delete the current chat."""
+        for qa in self.chats[self.current_chat]:
+            if qa.video:
+                asset_store.release(qa.video)
         del self.chats[self.current_chat]
         if len(self.chats) == 0:
             self.chats = DEFAULT_CHATS
@@ -146,7 +205,6 @@ class State(rx.State):
         return list(self.chats.keys())
 
     async def process_question(self, form_data: dict[str, str]):
-        img.update_file()
         # Get the question from the form
         question = form_data["question"]
 
@@ -157,14 +215,21 @@ class State(rx.State):
         
         model = self.openai_process_question
 
-        async for value in model(question):
-            yield value
+        trace = Trace()
+        with trace.span("total"):
+            async for value in model(question, trace):
+                yield value
+
+        metrics.record(trace)
+        self.chats[self.current_chat][-1].timings = trace.lines()
+        self.chats = self.chats
 
-    async def openai_process_question(self, question: str):
+    async def openai_process_question(self, question: str, trace: Trace):
         """Get the response from the API.
 
         Args:
-            form_data: A dict with the current question.
+            question: The current question.
+            trace: The Trace to time the stages in.
         """
 
         qa = QA(question=question, answer="")
@@ -172,56 +237,237 @@ class State(rx.State):
         self.processing = True
         yield
         
-        history_messages = format_history(self.chats[self.current_chat])
+        parser = StreamingCodeParser()
+        cached_response = None
+        orders = parse_orders(question) if batch_planning else []
+        # Batches of orders are planned directly, without the model.
+        batched = is_batch(orders)
+        if batched:
+            with trace.span("batch_plan"):
+                batch = plan_orders(orders)
+            parser.feed(
+                f"{describe_orders(orders, batch)}\n\nHere's the code to do this:\n\n```\n{batch.to_code()}```\n"
+            )
+            self.chats[self.current_chat][-1].answer = format_answer(parser.reason, parser.code)
+            self.chats = self.chats
+            yield
+        else:
+            with trace.span("prompt"):
+                # The question is passed separately, so leave its empty answer out.
+                history_messages = history.format(self.chats[self.current_chat][:-1])
+                examples = example_index.search(question, few_shot_examples)
+                messages = prompt.build(history_messages, question, examples)
         
-        final_template = history_messages
-        final_template.insert(0, ('system', template))
-        final_template.append(('human', human_template))
+            response_key = request_key(
+                question, history_messages, model.name, prompt.prefix_key, examples
+            )
+            cached_response = response_cache.get(response_key)
+            trace.count("response_cache_hits", cached_response is not None)
+
+            if cached_response is not None:
+                parser.feed(cached_response)
+                self.chats[self.current_chat][-1].answer = format_answer(parser.reason, parser.code)
+                self.chats = self.chats
+                yield
+            else:
+                started = time.perf_counter()
+                async for chunk in model.astream(messages):
+                    parser.feed(chunk)
+                    self.chats[self.current_chat][-1].answer = format_answer(parser.reason, parser.code)
+                    self.chats = self.chats
+                    yield
+                trace.add("llm", time.perf_counter() - started)
+
+        code = parser.code
+
+        if not code:
+            self.processing = False
+            return
 
-        prompt = ChatPromptTemplate.from_messages(final_template)
-        messages = prompt.format_messages(text=question)
-        
-        result = model.invoke(messages)
-        
-        parsed = CodeParser().parse(result.content)
-        
-        
-        reason = parsed[0]
-        code = parsed[1]
-        
-        exec_code = code.replace("python", "")
+        try:
+            with trace.span("parse"):
+                plan = Plan.from_code(code)
+        except PlanError as e:
+            self.chats[self.current_chat][-1].answer += f"Could not read the plan: {e}"
+            self.chats = self.chats
+            self.processing = False
+            return
 
-        exec_code = "config.output_dir = 'assets'\n" +  exec_code + "\nAIScene2 = AIScene() \nAIScene2.render()"
-        exec(exec_code)
-    
-        
-        source_path = "/Users/rohanarni/Projects/robot-systems-ai/webui/media/videos/1920p60/AIScene.mp4"
+        with trace.span("simulate"):
+            simulation = simulate(plan)
+        if not simulation.ok:
+            self.chats[self.current_chat][-1].answer += add_br_tags(
+                "The plan was not rendered because it breaks the floor rules:\n" + simulation.report()
+            )
+            self.chats = self.chats
+            self.processing = False
+            return
 
-        destination_dir = "/Users/rohanarni/Projects/robot-systems-ai/webui/assets/"
+        if schedule_plans:
+            with trace.span("schedule"):
+                scheduled = schedule(plan)
+            # The scheduler keeps every ordering the floor rules check, but
+            # only a plan the simulator passed is ever rendered.
+            if len(scheduled.steps) < len(plan.steps) and simulate(scheduled).ok:
+                plan = scheduled
+
+        # Only keep answers that work, so asking again can get a better one.
+        if not batched and cached_response is None:
+            response_cache.put(response_key, parser.text)
+
+        target = len(self.chats[self.current_chat]) - 1
+        self.chats[self.current_chat][target].plan = json.dumps(plan.to_dict())
+        if output_mode == "trajectory":
+            with trace.span("trajectory"):
+                self.chats[self.current_chat][target].animation = to_svg(build_trajectory(plan))
+            self.chats = self.chats
+            self.processing = False
+            return
 
-        destination_path = os.path.join(destination_dir, img.filename)
+        async for value in self.render_plan(plan, trace, target):
+            yield value
 
-        shutil.move(source_path, destination_path)
-            
-        answer_text = add_br_tags(reason)
-        
-        self.chats[self.current_chat][-1].answer += answer_text
-        self.chats = self.chats
-        
-        answer_text = rf"""
-```python3
-{code}
-```
-"""     
+    async def export_video(self, plan_json: str):
+        """Render the video of an answer that was shown as an animation.
 
-        
-        self.chats[self.current_chat][-1].answer += answer_text
+        Args:
+            plan_json: The answer's plan, as JSON.
+        """
+        if self.processing:
+            return
+        chat = self.chats[self.current_chat]
+        target = max(i for i, qa in enumerate(chat) if qa.plan == plan_json)
+        self.processing = True
+        yield
+
+        trace = Trace()
+        with trace.span("total"):
+            async for value in self.render_plan(Plan.from_dict(json.loads(plan_json)), trace, target):
+                yield value
+        metrics.record(trace)
+
+    async def render_plan(self, plan, trace: Trace, target: int):
+        """Render a plan and show it as early as possible.
+
+        The final render is streamed while it runs if streaming is on, or
+        else a quick draft is shown first if progressive rendering is.
+
+        Args:
+            plan: The plan to render.
+            trace: The Trace to time the stages in.
+            target: The index of the answer in the current chat.
+        """
+        self.chats[self.current_chat][target].rendering = True
         self.chats = self.chats
-        
-        time.sleep(5)
-        self.processing = False
-        
-        self.update_url(img.fileaddr)
 
+        passes = []
+        for tier in (["draft", "final"] if progressive_render and not stream_renders else ["final"]):
+            cache_key = scene_key(plan, render_settings(QUALITY_TIERS[tier]))
+            passes.append((tier, cache_key, render_cache.get(cache_key)))
+            trace.count("render_cache_hits", passes[-1][2] is not None)
+
+        # A cached final render makes the draft pointless.
+        if passes[-1][2] is not None:
+            passes = passes[-1:]
+
+        # Every render gets its own names within its session's namespace, so
+        # concurrent requests never write the same files.
+        session = self.session_namespace()
+        name = f"AIScene_{uuid.uuid4().hex[:12]}"
+        stream_dir = None
+        jobs = {}
+        for tier, cache_key, cached_path in passes:
+            if cached_path is None:
+                if stream_renders and tier == "final":
+                    stream_dir = asset_store.stream_directory(session, name)
+                jobs[tier] = render_pool.submit(
+                    plan, QUALITY_TIERS[tier], stream_dir if tier == "final" else None, session
+                )
+
+        for tier, cache_key, cached_path in passes:
+            streamed = False
+            if cached_path is None:
+                started = time.perf_counter()
+                async for status in render_pool.watch(jobs[tier], interval=0.2):
+                    self.render_status = f"{tier}: {status}"
+                    playlist = render_pool.playlist(jobs[tier])
+                    if playlist is not None and not streamed:
+                        streamed = True
+                        trace.add("first_segment", time.perf_counter() - started)
+                        # The playlist keeps changing, but its first segment
+                        # does not.
+                        await wait_until_servable(os.path.join(playlist.directory, playlist.first_segment))
+                        await wait_until_servable(playlist.path, complete=False)
+                        self.show_video(target, asset_url(playlist.path))
+                    yield
+
+                try:
+                    source_path, stats = await render_pool.result(jobs.pop(tier))
+                except Exception as e:
+                    for job_id in jobs.values():
+                        render_pool.cancel(job_id)
+                    if stream_dir is not None and not streamed:
+                        asset_store.release(asset_url(stream_dir))
+                    self.chats[self.current_chat][target].answer += f"Rendering failed: {e}"
+                    self.chats[self.current_chat][target].rendering = False
+                    self.chats = self.chats
+                    self.processing = False
+                    return
+
+                trace.add(f"{tier}_render", time.perf_counter() - started)
+                trace.add(f"{tier}_queue_wait", stats["queue_wait"])
+                for counter in ("frames", "segment_hits", "segment_misses"):
+                    trace.count(counter, stats[counter])
+
+                cached_path = render_cache.put(cache_key, source_path)
+                render_pool.discard(source_path)
+                if tier == "final" and stream_dir is not None and not streamed:
+                    # The render finished before the stream was shown.
+                    asset_store.release(asset_url(stream_dir))
+
+            if streamed:
+                # The playlist is complete now, so the player keeps going
+                # instead of restarting on the mp4.
+                self.processing = False
+                yield
+                continue
+
+            if tier == "final":
+                filename = f"{name}.mp4"
+            else:
+                filename = f"{name}_{tier}.mp4"
+            with trace.span("publish"):
+                asset_path = asset_store.publish(session, cached_path, filename)
+
+            with trace.span("servable"):
+                await wait_until_servable(asset_path)
+            # The handler keeps the session busy until the final render is
+            # done, so the draft only shows the video early.
+            if tier == "final":
+                self.processing = False
+
+            self.show_video(target, asset_url(asset_path))
+            yield
+
+    def session_namespace(self) -> str:
+        """Get the name of the session's assets and renders.
+
+        The client token ties a browser to its state, so it is hashed
+        rather than put in shareable asset URLs.
+        """
+        return hashlib.sha256(self.get_token().encode()).hexdigest()[:16]
 
+    def show_video(self, target: int, url: str):
+        """Show a video for an answer, in place of the one it showed.
 
+        Args:
+            target: The index of the answer in the current chat.
+            url: The URL of the video.
+        """
+        qa = self.chats[self.current_chat][target]
+        if qa.video:
+            asset_store.release(qa.video)
+        qa.video = url
+        qa.rendering = False
+        self.update_url(url)
+        self.chats = self.chats
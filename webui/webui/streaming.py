@@ -0,0 +1,131 @@
+"""Streaming renders as HLS while they are still running.
+
+A render worker remuxes every animation into an MPEG-TS segment as soon as
+Manim finishes it, without re-encoding, and lists it in its part's index.
+The playlist is written in the main process, which knows the order of the
+parts a plan was split into, so the video can start playing after the first
+animation instead of after the whole scene.
+"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+
+from webui.plan import MAX_WAIT
+
+PLAYLIST_NAME = "index.m3u8"
+
+# An upper bound on a segment's length, in seconds, fixed up front because
+# players read it once. A play lasts at most two seconds, for a move, and a
+# wait at most MAX_WAIT.
+TARGET_DURATION = math.ceil(max(MAX_WAIT, 2))
+
+
+def remux_segment(movie_path, segment_path):
+    """Copy a movie's streams into an MPEG-TS segment."""
+    partial = segment_path + ".part"
+    subprocess.run(
+        [
+            shutil.which("ffmpeg"), "-y", "-loglevel", "error",
+            "-i", movie_path, "-c", "copy", "-f", "mpegts", partial,
+        ],
+        check=True,
+    )
+    os.replace(partial, segment_path)
+
+
+class SegmentWriter:
+    """Writes the segments of one part of a render.
+
+    Args:
+        directory: The stream directory.
+        part: The index of the part in the plan.
+    """
+
+    def __init__(self, directory, part):
+        self.directory = directory
+        self.part = part
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, movie_path, duration):
+        """Add a finished animation's movie to the stream."""
+        name = f"{self.part:03d}_{self.count:04d}.ts"
+        remux_segment(movie_path, os.path.join(self.directory, name))
+        self.count += 1
+        # Segments are listed only once they are complete.
+        with open(self._index_path(), "a") as f:
+            f.write(json.dumps({"name": name, "duration": duration}) + "\n")
+
+    def close(self):
+        open(os.path.join(self.directory, f"{self.part:03d}.done"), "w").close()
+
+    def _index_path(self):
+        return os.path.join(self.directory, f"{self.part:03d}.index")
+
+
+class Playlist:
+    """The HLS playlist of a render that is split into parts.
+
+    Args:
+        directory: The stream directory the workers write into.
+        parts: How many parts the render has.
+    """
+
+    def __init__(self, directory, parts):
+        self.directory = directory
+        self.parts = parts
+        self.path = os.path.join(directory, PLAYLIST_NAME)
+        self.segments = 0
+        # The name of the first segment, once there is one.
+        self.first_segment = None
+        os.makedirs(directory, exist_ok=True)
+
+    def update(self):
+        """Rewrite the playlist with every segment that is ready, in order.
+
+        A part's segments are only listed once all parts before it are done,
+        and the playlist ends once every part is.
+
+        Returns:
+            Whether the playlist lists any segment.
+        """
+        entries = []
+        finished = True
+        for part in range(self.parts):
+            index_path = os.path.join(self.directory, f"{part:03d}.index")
+            if os.path.exists(index_path):
+                with open(index_path) as f:
+                    entries += [json.loads(line) for line in f if line.endswith("\n")]
+            if not os.path.exists(os.path.join(self.directory, f"{part:03d}.done")):
+                finished = False
+                break
+
+        if not entries or (len(entries) == self.segments and not finished):
+            return self.segments > 0
+
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{TARGET_DURATION}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for i, entry in enumerate(entries):
+            # Every segment's timestamps start at zero.
+            if i:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{entry['duration']:.3f},")
+            lines.append(entry["name"])
+        if finished:
+            lines.append("#EXT-X-ENDLIST")
+
+        partial = self.path + ".part"
+        with open(partial, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(partial, self.path)
+        self.segments = len(entries)
+        self.first_segment = entries[0]["name"]
+        return True
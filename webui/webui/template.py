@@ -62,111 +62,65 @@ Now, the robot can move with the item picked up:
         self.play(self.blue_bot.move_to_point((22, 25)))
         self.wait(1)
 
-Then, the robot can place the item at a near coordinate:
-
-        self.play(self.blue_bot.move_to_point((22, 25)))
-        self.wait(1)
-
-Here's an example with the blue Robot:
-
-class AIScene(RobotScene):
-    def construct(self):
-        super().construct() 
-
-        item = Item(self, color=GREEN, position=(5, 25))
-        self.add(item.item)
-
-        self.play(self.blue_bot.move_to_point((5, 25)))
-        self.wait(1)
-
-        self.play(self.blue_bot.pick_up_item(item))
-        self.wait(1)
-
-        self.play(self.blue_bot.move_to_point((23, 25)))
-        self.wait(1)
+Then, the robot can place the item at a near coordinate, such as the barrier:
 
         self.play(self.blue_bot.place_item((25, 25)))
         self.wait(1)
 
-        self.play(self.blue_bot.move_to_point((12.5, 25)))
-        self.wait(1)
-
+Worked examples of complete answers for requests like the current one are given after these instructions.
 
+The robots cannot cross the barrier. If you need to move things across the barrier, use one robot to move the item to the barrier and then the other one can pick it up and move it. Remember, the blue robot should never move to an x-coordinate greater than 23, and the red robot should never move to an x coordinate smaller than 27. This means that the blue robot works with load zones A, B, and C and the red robot works with load zones D, E, and F. 
 
-If you want to use the Red bot (if you are working on the right side of the field), you can use:
+First, reason with the prompt by generating a list of steps. Be sure to restate the prompt. Then, generate code. Make sure to use the format: ``` to begin the class and ``` to end it. Remember, if you need to move objects on the grid, you need to create them first. 
 
+'''
+        # A complete answer in the format the prompt asks for, used by the
+        # offline stub chat model.
+        self.example_answer = '''
+To move the item from load zone D to load zone A, we can do the following:
+
+1. Create the item at load zone D.
+2. Move the red robot to load zone D and pick up the item.
+3. Move the red robot to the barrier and place the item on it.
+4. Move the blue robot to the barrier and pick up the item.
+5. Move the blue robot to load zone A and place the item.
+
+```python
 class AIScene(RobotScene):
     def construct(self):
         super().construct()
 
-        # Place an item at load zone A
         item = Item(self, color=GREEN, position=(45, 40))
         self.add(item.item)
 
-        # Move the red robot to pick up the item
-        self.play(self.red_bot.move_to_point((5, 40)))
+        self.play(self.red_bot.move_to_point((45, 40)))
         self.wait(1)
 
-        # Pick up the item
         self.play(self.red_bot.pick_up_item(item))
         self.wait(1)
 
-        # Move the red robot to the barrier
         self.play(self.red_bot.move_to_point((27, 25)))
         self.wait(1)
 
-        # Place the item on the barrier
-        self.play(self.red_.place_item((25, 25)))
-        self.wait(1)
-
-        # Move the red robot back to its initial position
-        self.play(self.blue_bot.move_to_point((37.5, 25)))
+        self.play(self.red_bot.place_item((25, 25)))
         self.wait(1)
-        
 
-Example prompt: 
-
-"Place an item at load zone A and move it to the barrier."
-
-To place an item at load zone A and move it to the barrier, we can do the following:
-
-1. Create an item at load zone A. 
-2. Move the blue robot to load zone A.
-3. Pick up the item at load zone A.
-4. Move closer to the barrier, but avoid crossing it.
-5. Place the item on the barrier.
-
-Here's the code to do this:
-
-
-```
-class AIScene(RobotScene):
-    def construct(self):
-        super().construct() 
-
-        item = Item(self, color=GREEN, position=(5, 25))
-        self.add(item.item)
-
-        self.play(self.blue_bot.move_to_point((5, 25)))
+        self.play(self.blue_bot.move_to_point((23, 25)))
         self.wait(1)
 
         self.play(self.blue_bot.pick_up_item(item))
         self.wait(1)
 
-        self.play(self.blue_bot.move_to_point((23, 25)))
-        self.wait(1)
-
-        self.play(self.blue_bot.place_item((25, 25)))
+        self.play(self.blue_bot.move_to_point((5, 40)))
         self.wait(1)
 
-        self.play(self.blue_bot.move_to_point((12.5, 25)))
+        self.play(self.blue_bot.place_item((5, 40)))
         self.wait(1)
 ```
-
-The robots cannot cross the barrier. If you need to move things across the barrier, use one robot to move the item to the barrier and then the other one can pick it up and move it. Remember, the blue robot should never move to an x-coordinate greater than 23, and the blue robot should never move to an x coordinate smaller than 27. This means that the blue robot works with load zones A, B, and C and the red robot works with load zones D, E, and F. 
-
-First, reason with the prompt by generating a list of steps. Be sure to restate the prompt. Then, generate code. Make sure to use the format: ``` to begin the class and ``` to end it. Remember, if you need to move objects on the grid, you need to create them first. 
-
 '''
+
     def return_template(self):
-        return self.template
\ No newline at end of file
+        return self.template
+
+    def return_example_answer(self):
+        return self.example_answer
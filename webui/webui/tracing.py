@@ -0,0 +1,100 @@
+"""Timing the stages of a request, and totals of every request for monitoring."""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Trace:
+    """The time spent in each stage of one request, and counters like frames rendered."""
+
+    def __init__(self):
+        # (stage, seconds) in the order the stages finished.
+        self.spans = []
+        self.counts = defaultdict(int)
+
+    @contextmanager
+    def span(self, name):
+        """Time the block inside as a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """Record a stage timed elsewhere."""
+        self.spans.append((name, seconds))
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def durations(self):
+        """Get the total seconds of every stage, summing repeated spans."""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def lines(self):
+        """Describe the trace one stage or counter per line."""
+        lines = [f"{name}: {seconds * 1000:.0f} ms" for name, seconds in self.durations().items()]
+        lines += [f"{name}: {count:g}" for name, count in self.counts.items()]
+        return lines
+
+
+class Metrics:
+    """Stage timings and counters summed over every trace, in the Prometheus
+    text exposition format.
+
+    Args:
+        prefix: The prefix of every metric name.
+        buckets: The upper bounds, in seconds, of the stage histograms.
+    """
+
+    def __init__(self, prefix="webui", buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.requests = 0
+        self.stage_buckets = defaultdict(lambda: [0] * len(self.buckets))
+        self.stage_sums = defaultdict(float)
+        self.stage_counts = defaultdict(int)
+        self.counts = defaultdict(float)
+
+    def record(self, trace):
+        """Add a finished request's trace."""
+        self.requests += 1
+        for name, seconds in trace.durations().items():
+            self.stage_sums[name] += seconds
+            self.stage_counts[name] += 1
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.stage_buckets[name][i] += 1
+        for name, count in trace.counts.items():
+            self.counts[name] += count
+
+    def exposition(self):
+        """Write every metric out as Prometheus text."""
+        stage = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {self.prefix}_requests_total Requests traced.",
+            f"# TYPE {self.prefix}_requests_total counter",
+            f"{self.prefix}_requests_total {self.requests}",
+            f"# HELP {stage} Time spent in each stage of a request.",
+            f"# TYPE {stage} histogram",
+        ]
+        for name in self.stage_sums:
+            for bound, count in zip(self.buckets, self.stage_buckets[name]):
+                lines.append(f'{stage}_bucket{{stage="{name}",le="{bound:g}"}} {count}')
+            lines.append(f'{stage}_bucket{{stage="{name}",le="+Inf"}} {self.stage_counts[name]}')
+            lines.append(f'{stage}_sum{{stage="{name}"}} {self.stage_sums[name]:.6f}')
+            lines.append(f'{stage}_count{{stage="{name}"}} {self.stage_counts[name]}')
+        for name, count in self.counts.items():
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {count:g}")
+        return "\n".join(lines) + "\n"
+
+
+# The totals of every request this process served.
+metrics = Metrics()
@@ -0,0 +1,193 @@
+"""Plans as keyframes the browser animates, instead of rendered video.
+
+A trajectory lists every bot's and item's positions with the times they
+are reached, following the same paths and timings as a render: every play
+lasts a second, waits last their duration and moves follow the path
+planner's waypoints. It is drawn as an SVG whose SMIL animations the
+browser plays by itself, a few kilobytes per answer.
+"""
+
+import math
+
+from webui.layout import BARRIER_X, GRID_SIZE, LOAD_ZONE_SIZE, LOAD_ZONES, OBSTACLES, SCENE_SIZE
+from webui.pathing import find_path
+from webui.plan import BOTS, BOT_OPERATIONS
+from webui.simulator import simulate
+
+# The colors Manim draws with, by name.
+COLORS = {
+    "BLUE": "#58C4DD",
+    "RED": "#FC6255",
+    "GREEN": "#83C167",
+    "ORANGE": "#FF862F",
+    "PURPLE": "#9A72AC",
+    "YELLOW": "#FFFF00",
+    "TEAL": "#5CD0B3",
+    "PINK": "#D147BD",
+    "GOLD": "#F0AC5F",
+    "MAROON": "#C55F73",
+    "GRAY": "#888888",
+    "WHITE": "#FFFFFF",
+    "BLACK": "#000000",
+}
+
+BOT_COLORS = {"blue_bot": "BLUE", "red_bot": "RED"}
+
+# Sizes as drawn by grid_scene, in grid units.
+BOT_SIZE = 1.2 * GRID_SIZE / SCENE_SIZE
+ITEM_RADIUS = 0.3 * GRID_SIZE / SCENE_SIZE
+
+# How long one play lasts, as Manim's default run time.
+PLAY_SECONDS = 1.0
+
+
+def build_trajectory(plan):
+    """Work out the keyframes of a plan.
+
+    Returns:
+        A dict with the total duration in seconds and, for every bot and
+        item, its color and [time, x, y] keyframes. Items also have the
+        time they appear.
+    """
+    states = simulate(plan).states
+    tracks = {
+        bot: {"color": BOT_COLORS[bot], "keys": [[0.0, *(float(v) for v in states[0].bot_position(bot))]]}
+        for bot in BOTS
+    }
+    items = {}
+    t = 0.0
+    for index, step in enumerate(plan.steps):
+        before, after = states[index], states[index + 1]
+        if step[0].op == "create_item":
+            for action in step:
+                items[action.item] = {"color": action.color, "appears": t, "keys": [[t, *action.point]]}
+            continue
+        if step[0].op == "wait":
+            t += sum(action.duration for action in step)
+            continue
+
+        end = t + PLAY_SECONDS
+        for action in step:
+            if action.op not in BOT_OPERATIONS:
+                continue
+            start_point = before.bot_position(action.bot)
+            end_point = after.bot_position(action.bot)
+            if action.op == "move_to_point" and start_point != end_point:
+                waypoints = find_path(action.bot, start_point, end_point) or [start_point, end_point]
+                _move(tracks[action.bot]["keys"], waypoints, t, end)
+                held = before.held[BOTS.index(action.bot)]
+                if held >= 0:
+                    _move(items[before.item_names[held]]["keys"], waypoints, t, end)
+            elif action.op == "pick_up_item":
+                _move(items[action.item]["keys"], [before.item_position(action.item), after.item_position(action.item)], t, end)
+            elif action.op == "place_item":
+                held = before.held[BOTS.index(action.bot)]
+                if held >= 0:
+                    name = before.item_names[held]
+                    _move(items[name]["keys"], [before.item_position(name), after.item_position(name)], t, end)
+        t = end
+
+    return {
+        "duration": round(t, 3),
+        "bots": tracks,
+        "items": items,
+    }
+
+
+def _move(keys, waypoints, start, end):
+    """Add the keyframes of moving through waypoints between two times, at a
+    steady speed."""
+    lengths = [math.dist(a, b) for a, b in zip(waypoints, waypoints[1:])]
+    total = sum(lengths)
+    if not total:
+        return
+    if keys[-1][0] < start:
+        keys.append([start, *keys[-1][1:]])
+    elapsed = 0.0
+    for length, point in zip(lengths, waypoints[1:]):
+        elapsed += length
+        keys.append([round(start + (end - start) * elapsed / total, 3), *(round(float(v), 2) for v in point)])
+
+
+def to_svg(trajectory, size=450):
+    """Draw a trajectory as an SVG that animates itself.
+
+    Args:
+        trajectory: The keyframes from build_trajectory.
+        size: The width and height in pixels.
+
+    Returns:
+        The SVG markup.
+    """
+    duration = trajectory["duration"]
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {GRID_SIZE} {GRID_SIZE}" style="background:#fff">'
+    ]
+    for value in range(0, GRID_SIZE + 1, 5):
+        parts.append(f'<line x1="{value}" y1="0" x2="{value}" y2="{GRID_SIZE}" stroke="#000" stroke-width="0.08"/>')
+        parts.append(f'<line x1="0" y1="{value}" x2="{GRID_SIZE}" y2="{value}" stroke="#000" stroke-width="0.08"/>')
+    parts.append(f'<line x1="{BARRIER_X}" y1="0" x2="{BARRIER_X}" y2="{GRID_SIZE}" stroke="#000" stroke-width="0.3"/>')
+
+    width, height = (value * GRID_SIZE / SCENE_SIZE for value in LOAD_ZONE_SIZE)
+    for name, (x, y) in LOAD_ZONES.items():
+        parts.append(
+            f'<rect x="{x - width / 2:g}" y="{_flip(y) - height / 2:g}" width="{width:g}" height="{height:g}" '
+            f'fill="{COLORS["BLUE"]}" fill-opacity="0.5" stroke="{COLORS["BLUE"]}" stroke-width="0.2"/>'
+        )
+        parts.append(
+            f'<text x="{x}" y="{_flip(y)}" font-size="3" text-anchor="middle" dominant-baseline="central">{name}</text>'
+        )
+    for x0, y0, x1, y1 in OBSTACLES:
+        parts.append(
+            f'<rect x="{x0}" y="{_flip(y1)}" width="{x1 - x0}" height="{y1 - y0}" fill="{COLORS["GRAY"]}" fill-opacity="0.8"/>'
+        )
+
+    for item in trajectory["items"].values():
+        color = COLORS.get(item["color"], COLORS["GREEN"])
+        shape = f'<circle r="{ITEM_RADIUS:.2f}" fill="none" stroke="{color}" stroke-width="0.3"/>'
+        parts.append(_animated(shape, item["keys"], duration, item["appears"]))
+
+    for bot in trajectory["bots"].values():
+        color = COLORS[bot["color"]]
+        shape = (
+            f'<rect x="{-BOT_SIZE / 2:.2f}" y="{-BOT_SIZE / 2:.2f}" width="{BOT_SIZE:.2f}" height="{BOT_SIZE:.2f}" '
+            f'fill="none" stroke="{color}" stroke-width="0.3"/>'
+        )
+        parts.append(_animated(shape, bot["keys"], duration))
+
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _flip(y):
+    """SVG y grows downwards, grid y upwards."""
+    return GRID_SIZE - y
+
+
+def _animated(shape, keys, duration, appears=0.0):
+    """Wrap a shape drawn around the origin in a group that follows keyframes,
+    hidden until it appears."""
+    x, y = keys[0][1], _flip(keys[0][2])
+    if appears > 0:
+        group = (
+            f'<g transform="translate({x:g} {y:g})" visibility="hidden">'
+            f'<set attributeName="visibility" to="visible" begin="{appears:g}s" fill="freeze"/>'
+        )
+    else:
+        group = f'<g transform="translate({x:g} {y:g})">'
+    if duration > 0 and len(keys) > 1:
+        times = ";".join(f"{min(max(t / duration, 0.0), 1.0):.4f}" for t, _, _ in keys)
+        values = ";".join(f"{px:g} {_flip(py):g}" for _, px, py in keys)
+        # keyTimes have to start at 0 and end at 1.
+        if keys[0][0] > 0:
+            times = "0;" + times
+            values = f"{x:g} {y:g};" + values
+        if keys[-1][0] < duration:
+            times += ";1"
+            values += f";{keys[-1][1]:g} {_flip(keys[-1][2]):g}"
+        group += (
+            f'<animateTransform attributeName="transform" type="translate" dur="{duration:g}s" '
+            f'keyTimes="{times}" values="{values}" fill="freeze"/>'
+        )
+    return group + shape + "</g>"
@@ -1,26 +1,16 @@
 """The main Chat app."""
 
 import reflex as rx
-import os
+from fastapi.responses import PlainTextResponse
 
 from webui import styles
 from webui.components import chat, modal, navbar, sidebar
 from webui.state import State
-def clear_filepath():
-    destination_dir = "/Users/rohanarni/Projects/robot-systems-ai/webui/assets/"
-
-    files_in_directory = os.listdir(destination_dir)
-    mp4_files = [file for file in files_in_directory if file.endswith(".mp4")]
-
-    for mp4_file in mp4_files:
-        file_path = os.path.join(destination_dir, mp4_file)
-        os.remove(file_path)
-
+from webui.tracing import metrics
 
 
 @rx.page(title="SystemsAI")
 def index() -> rx.Component:
-    clear_filepath()
     """The main app."""
     return rx.vstack(
         navbar(),
@@ -36,6 +26,12 @@ def index() -> rx.Component:
     )
 
 
+async def metrics_endpoint():
+    """Serve the request metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
+
 # Add state and page to the app.
 app = rx.App(style=styles.base_style)
 app.add_page(index)
+app.api.add_api_route("/metrics", metrics_endpoint)